@@ -1,13 +1,19 @@
+import math
+import os
+# BLAS sizes its thread pool when numpy loads, limit it before any import does
+from thread_budget import ThreadBudget, limit_blas_threads
+limit_blas_threads(int(os.environ.get('BLAS_THREADS', 1)))
+
 from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from flask_socketio import SocketIO, emit
 import cv2
-import os
 import json
 import pygame
 import time
 import base64
 from gtts import gTTS
 from flask_cors import CORS
+from werkzeug.utils import safe_join
 import asyncio
 import traceback
 from concurrent.futures import ThreadPoolExecutor
@@ -18,7 +24,18 @@ import threading
 from rtc_video_server import process_offer
 
 # Import exercise modules
-from utils import calculate_angle
+from utils import calculate_angle, landmarks_from_payload
+from frame_sources import PushedFrameSource, SyntheticSource, open_source, open_video
+from broadcaster import Broadcaster
+from pacing import FramePacer
+from complexity import ComplexityController
+from roi import RoiTracker
+from prediction import LandmarkPredictor
+from landmark_cache import LandmarkCache
+from pose_pool import PosePool, pose_pool
+from pose_tasks import LiveStreamPose
+from pose_backends import create_backend
+from inference_workers import ProcessPosePool
 from exercises.bicep_curl import hummer
 from exercises.front_raise import dumbbell_front_raise
 from exercises.squat import squat
@@ -29,6 +46,8 @@ from exercises.plank import plank
 from exercises.lateral_raise import side_lateral_raise
 from exercises.triceps_kickback import triceps_kickback_side
 from exercises.push_ups import push_ups
+from exercises import exercise_map, tracker_map
+from exercises.base import stream_group_exercise
 
 app = Flask(__name__, static_folder='static')
 CORS(app)  # Enable CORS for all routes
@@ -59,19 +78,98 @@ os.makedirs("audio", exist_ok=True)
 # Dictionary to store active sessions
 active_sessions = {}
 
-# Dictionary to store exercise functions
-exercise_map = {
-    'hummer': hummer,
-    'front_raise': dumbbell_front_raise,
-    'squat': squat,
-    'triceps': triceps_extension,
-    'lunges': lunges,
-    'shoulder_press': shoulder_press,
-    'plank': plank,
-    'side_lateral_raise': side_lateral_raise,
-    'triceps_kickback_side': triceps_kickback_side,
-    'push_ups': push_ups
-}
+# Shared trackers, one per (source, exercise), fanned out to all viewers
+broadcaster = Broadcaster()
+
+# Directory with recorded sets that can be replayed through the trackers
+RECORDINGS_DIR = os.environ.get('RECORDINGS_DIR', 'recordings')
+
+# Frames pushed by browsers over the socket, one bounded queue per client
+pushed_sources = {}
+PUSH_QUEUE_SIZE = int(os.environ.get('PUSH_QUEUE_SIZE', 2))
+
+# Default frame rate of each stream, 0 streams as fast as the source allows.
+# Lower rates fit more athletes on one instance.
+TARGET_FPS = float(os.environ.get('TARGET_FPS', 0))
+
+# Number of separate processes running pose detection, 0 runs it in the
+# request threads. Separate processes use every core from one web worker.
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))
+
+# Pose detection runtime: 'solutions' runs the mediapipe Pose graph on each
+# frame, 'tasks' runs the PoseLandmarker asynchronously and draws its latest
+# result, 'onnx' and 'tflite' run the landmark model on ONNX Runtime or the
+# bare TFLite interpreter (best with ROI_CROP=1, they have no person detector)
+POSE_BACKEND = os.environ.get('POSE_BACKEND', 'solutions')
+POSE_THREADS = int(os.environ.get('POSE_THREADS', 0)) or None
+POSE_MODEL = os.environ.get('POSE_MODEL')
+
+POSE_POOL_SIZE = int(os.environ.get('POSE_POOL_SIZE', 0)) or None
+
+if INFERENCE_PROCESSES:
+    inference_pool = ProcessPosePool(INFERENCE_PROCESSES)
+elif POSE_BACKEND == 'tasks':
+    inference_pool = PosePool(size=POSE_POOL_SIZE, factory=LiveStreamPose)
+elif POSE_BACKEND in ('onnx', 'tflite'):
+    inference_pool = PosePool(
+        size=POSE_POOL_SIZE,
+        factory=lambda level: create_backend(POSE_BACKEND, level, thread_budget.inference_threads(), POSE_MODEL)
+    )
+else:
+    inference_pool = pose_pool
+
+# Cores shared out between the running streams' OpenCV, inference and BLAS
+# thread pools. POSE_THREADS and OPENCV_THREADS fix a pool's size instead
+# of following each stream's share. Pooled graphs are built before any
+# stream starts and then reused, so their inference threads are the share
+# of a full pool, one stream per graph.
+thread_budget = ThreadBudget(
+    cores=int(os.environ.get('CPU_CORES', 0)) or None,
+    opencv_threads=int(os.environ.get('OPENCV_THREADS', 0)) or None,
+    inference_threads=POSE_THREADS,
+    blas_threads=int(os.environ.get('BLAS_THREADS', 1)),
+    max_sessions=getattr(inference_pool, 'size', None)
+)
+thread_budget.apply(1)
+
+# Pose graphs built and run on synthetic frames while the worker starts, so
+# the first stream after a scale-up does not wait for model loading.
+# "all" warms the whole pool, 0 skips the warm-up.
+POSE_WARMUP = os.environ.get('POSE_WARMUP', 'all')
+if POSE_WARMUP != '0':
+    inference_pool.warm(None if POSE_WARMUP == 'all' else int(POSE_WARMUP))
+
+# Pose detection latency each stream aims for, in milliseconds. Streams over
+# it switch to a lighter model, 0 keeps every stream at the standard model.
+LATENCY_TARGET_MS = float(os.environ.get('LATENCY_TARGET_MS', 0))
+
+# Longest side in pixels of the images pose detection runs on, 0 detects at
+# the camera resolution. Overlays are always drawn at the camera resolution.
+INFERENCE_SIZE = int(os.environ.get('INFERENCE_SIZE', 0))
+
+# Run pose detection on every Nth frame and predict the landmarks of the
+# frames between, 1 detects on every frame
+DETECT_EVERY = int(os.environ.get('DETECT_EVERY', 1))
+
+# Directory keeping the landmarks detected on replayed recordings, so later
+# replays of the same video skip detection. Unset disables the cache.
+LANDMARK_CACHE_DIR = os.environ.get('LANDMARK_CACHE_DIR')
+landmark_cache = LandmarkCache(LANDMARK_CACHE_DIR) if LANDMARK_CACHE_DIR else None
+
+# Most athletes one group stream (people=N) tracks, bounds the CPU per camera
+MAX_PEOPLE = int(os.environ.get('MAX_PEOPLE', 6))
+
+# Crop pose detection to the athlete's last position instead of the full frame
+ROI_CROP = os.environ.get('ROI_CROP', '0') == '1'
+
+# Frame pacers of the running streams, by stream key, for monitoring
+stream_pacers = {}
+
+# Model complexity controllers of the running streams, by stream key
+stream_complexity = {}
+
+# Exercise trackers of clients that run pose detection themselves, by socket id
+landmark_sessions = {}
 
 # @app.route('/')
 # def index():
@@ -164,15 +262,184 @@ def video_feedd(exercise):
 
 import numpy as np
 
+def resolve_source(args):
+    """
+    Pick the frame source for a stream from the request arguments
+    
+    Args:
+        args: Request query arguments
+        
+    Returns:
+        Frame source, or None for the default camera
+    """
+    session_id = args.get('session')
+    if session_id:
+        if session_id not in pushed_sources:
+            raise ValueError(f"No frames are being pushed for session: {session_id}")
+        return pushed_sources[session_id]
+
+    if args.get('source') == 'synthetic':
+        return SyntheticSource(fps=30)
+    
+    video = args.get('video')
+    if video:
+        # Only replay files from the recordings directory
+        path = safe_join(RECORDINGS_DIR, video)
+        if path is None:
+            raise ValueError(f"Invalid recording name: {video}")
+        return open_video(path, loop=True, realtime=True)
+
+    return None
+
+def source_key(args):
+    """
+    Name the frame source a request asks for, so viewers of the same source share it
+
+    Args:
+        args: Request query arguments
+
+    Returns:
+        String identifying the source
+    """
+    if args.get('session'):
+        return f"push:{args['session']}"
+
+    if args.get('source') == 'synthetic':
+        return 'synthetic'
+
+    video = args.get('video')
+    if video:
+        if safe_join(RECORDINGS_DIR, video) is None:
+            raise ValueError(f"Invalid recording name: {video}")
+        return f'video:{video}'
+
+    return 'camera'
+
+# Numeric stream settings a request may pass, as (name, type, default, minimum)
+STREAM_SETTINGS = [
+    ('fps', float, TARGET_FPS, 0),
+    ('latency_ms', float, LATENCY_TARGET_MS, 0),
+    ('inference_size', int, INFERENCE_SIZE, 0),
+    ('detect_every', int, DETECT_EVERY, 1),
+    ('people', int, 1, 1)
+]
+
+def stream_options(args):
+    """
+    Parse and check the stream settings of a request
+
+    Args:
+        args: Request query arguments
+
+    Returns:
+        Dictionary with the target frame rate (fps), detection latency
+        (latency_ms), detection resolution (inference_size), how often to
+        run detection (detect_every), how many athletes to track (people,
+        capped at MAX_PEOPLE) and whether to crop detection to the athlete
+        (roi)
+
+    Raises:
+        ValueError: When a setting is not a number or is out of range
+    """
+    options = {}
+    for name, parse, default, minimum in STREAM_SETTINGS:
+        value = args.get(name)
+        try:
+            value = default if value is None else parse(value)
+        except ValueError:
+            raise ValueError(f"Invalid {name}: {value}")
+        if not math.isfinite(value) or value < minimum:
+            raise ValueError(f"Invalid {name}: {value}, it must be a number of at least {minimum}")
+        options[name] = value
+    options['people'] = min(options['people'], MAX_PEOPLE)
+
+    roi = args.get('roi', '1' if ROI_CROP else '0')
+    if roi not in ('0', '1'):
+        raise ValueError(f"Invalid roi: {roi}, it must be 0 or 1")
+    options['roi'] = roi == '1'
+    return options
+
+def stream_key(exercise, args, options):
+    """
+    Key of the broadcast serving a request, group streams are kept apart
+    from single athlete streams of the same source
+
+    The other settings are not part of the key: viewers that join a running
+    broadcast get the fps, latency_ms, roi, inference_size and detect_every
+    of the viewer who started it, whatever they asked for themselves.
+    """
+    if options['people'] > 1:
+        return (source_key(args), exercise, options['people'])
+    return (source_key(args), exercise)
+
+def produce_frames(exercise, args, options):
+    """
+    Run one exercise tracker on its source and release the source when it stops
+
+    Args:
+        exercise: ID of the exercise to track
+        args: Request query arguments selecting the source
+        options: Stream settings parsed by stream_options()
+
+    Yields:
+        Annotated MJPEG frame chunks
+    """
+    key = str(stream_key(exercise, args, options))
+    pacer = FramePacer(options['fps'])
+    source = open_source(resolve_source(args))
+    complexity = ComplexityController(options['latency_ms'])
+    roi = RoiTracker() if options['roi'] else None
+    detect_every = options['detect_every']
+    predictor = LandmarkPredictor(detect_every) if detect_every > 1 else None
+    stream_pacers[key] = pacer
+    stream_complexity[key] = complexity
+    try:
+        with thread_budget.session():
+            people = options['people']
+            if people > 1:
+                yield from stream_group_exercise(tracker_map[exercise], source, max_people=people,
+                                                 pool=inference_pool, pacer=pacer)
+                return
+            yield from exercise_map[exercise](sound, source, pacer=pacer, pool=inference_pool,
+                                              complexity=complexity, roi=roi,
+                                              inference_size=options['inference_size'],
+                                              predictor=predictor, landmark_cache=landmark_cache)
+    finally:
+        stream_pacers.pop(key, None)
+        stream_complexity.pop(key, None)
+        # Pushed sources belong to the socket session and are closed on disconnect
+        if not isinstance(source, PushedFrameSource):
+            source.release()
+
 @app.route('/video_feed/<exercise>')
 def video_feed(exercise):
+    """
+    MJPEG stream of an exercise tracked on a camera, recording or pushed session
+
+    Viewers of the same source and exercise share one tracker, which runs
+    with the settings of the first viewer. A later viewer's fps, latency_ms,
+    roi, inference_size and detect_every are checked but not applied until
+    the shared stream stops and a new one starts. Only people starts a
+    separate stream.
+    """
     try:
         if exercise in exercise_map:
             # محاولة استخدام الدالة الأصلية
             try:
                 print(f"Starting video feed for exercise: {exercise}")
+                # Viewers of the same source and exercise share one tracker
+                args = request.args.to_dict()
+                session_id = args.get('session')
+                if session_id and session_id not in pushed_sources:
+                    return f"No frames are being pushed for session: {session_id}", 404
+                try:
+                    options = stream_options(args)
+                    key = stream_key(exercise, args, options)
+                except ValueError as e:
+                    return str(e), 400
+                stream = broadcaster.subscribe(key, lambda: produce_frames(exercise, args, options))
                 return Response(
-                    exercise_map[exercise](sound), 
+                    stream,
                     mimetype='multipart/x-mixed-replace; boundary=frame',
                     headers={
                         'Cache-Control': 'no-cache, no-store, must-revalidate',
@@ -259,6 +526,147 @@ def video_feed(exercise):
         app.logger.error(traceback.format_exc())
         return "Error processing video", 500
 
+@app.route('/api/streams')
+def stream_stats():
+    """
+    List the running tracker broadcasts, how many viewers each one has, how
+    much of its frame budget it uses and which pose model it runs
+    """
+    streams = broadcaster.stats()
+    for stream in streams:
+        pacer = stream_pacers.get(stream['key'])
+        if pacer is not None:
+            stream['pacing'] = pacer.stats()
+        complexity = stream_complexity.get(stream['key'])
+        if complexity is not None:
+            stream['complexity'] = complexity.stats()
+    return jsonify(streams)
+
+@app.route('/api/pose_pool')
+def pose_pool_stats():
+    """
+    Show how many Pose graphs are in use, how long streams waited for one and
+    how long the warm-up took, or the inference processes and their load
+    when detection runs in them
+    """
+    return jsonify(inference_pool.stats())
+
+@app.route('/api/threads')
+def thread_budget_stats():
+    """
+    Show how the cores are shared out between the running streams
+    """
+    return jsonify(thread_budget.stats())
+
+# ====================== Browser frame ingestion ======================
+
+def decode_pushed_frame(data):
+    """
+    Extract the encoded image bytes from a pushed frame message
+
+    Args:
+        data: Binary JPEG, base64 string or data URL
+
+    Returns:
+        Encoded image bytes
+    """
+    if isinstance(data, dict):
+        data = data.get('frame')
+    if isinstance(data, (bytes, bytearray)):
+        return bytes(data)
+    if isinstance(data, str):
+        # Strip the "data:image/jpeg;base64," prefix of canvas.toDataURL()
+        if data.startswith('data:'):
+            data = data.split(',', 1)[1]
+        return base64.b64decode(data)
+    raise ValueError("Unsupported frame payload")
+
+@socketio.on('start_push')
+def handle_start_push(data=None):
+    """
+    Open a frame queue for this client and tell it where the annotated stream is
+    """
+    exercise = (data or {}).get('exercise_id')
+    if exercise not in exercise_map:
+        emit('error', {'message': f'Invalid exercise: {exercise}'})
+        return
+
+    if request.sid not in pushed_sources:
+        pushed_sources[request.sid] = PushedFrameSource(max_queued=PUSH_QUEUE_SIZE)
+
+    emit('push_started', {
+        'session_id': request.sid,
+        'feed_url': f'/video_feed/{exercise}?session={request.sid}'
+    })
+
+@socketio.on('push_frame')
+def handle_push_frame(data):
+    """
+    Queue one camera frame sent by the browser
+    """
+    source = pushed_sources.get(request.sid)
+    if source is None:
+        emit('error', {'message': 'Call start_push before sending frames'})
+        return
+
+    try:
+        source.push(decode_pushed_frame(data))
+    except Exception as e:
+        emit('error', {'message': f'Invalid frame: {str(e)}'})
+
+# ====================== Browser landmark upload ======================
+
+@socketio.on('start_landmarks')
+def handle_start_landmarks(data=None):
+    """
+    Start applying an exercise's rules to landmarks detected by the client
+    """
+    exercise = (data or {}).get('exercise_id')
+    if exercise not in tracker_map:
+        emit('error', {'message': f'Invalid exercise: {exercise}'})
+        return
+
+    # No audio on the server, the client renders its own feedback
+    landmark_sessions[request.sid] = tracker_map[exercise]()
+    emit('landmarks_started', {'session_id': request.sid, 'exercise_id': exercise})
+
+@socketio.on('landmarks')
+def handle_landmarks(data):
+    """
+    Apply the exercise rules to one frame of uploaded landmarks
+    """
+    tracker = landmark_sessions.get(request.sid)
+    if tracker is None:
+        emit('error', {'message': 'Call start_landmarks before sending landmarks'})
+        return
+
+    points = data.get('landmarks') if isinstance(data, dict) else data
+    if not points:
+        # No person detected on the client for this frame
+        return
+
+    try:
+        landmarks = landmarks_from_payload(points)
+    except (TypeError, ValueError) as e:
+        emit('error', {'message': f'Invalid landmarks: {str(e)}'})
+        return
+
+    if isinstance(data, dict) and data.get('width') and data.get('height'):
+        tracker.frame_size = (int(data['width']), int(data['height']))
+
+    emit('exercise_state', tracker.update(landmarks))
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    """
+    Close the client's frame queue and landmark tracker, which ends its session
+    """
+    source = pushed_sources.pop(request.sid, None)
+    if source is not None:
+        print(f"Closing pushed frames for {request.sid}: {source.stats()}")
+        source.release()
+    landmark_sessions.pop(request.sid, None)
+
 #===========================test=============================================== 
 
 
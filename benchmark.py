@@ -0,0 +1,423 @@
+"""
+Replay a recorded set (or synthetic frames) through an exercise tracker as
+fast as the CPU allows and report the achieved throughput.
+
+Usage:
+    python benchmark.py squat --video recordings/squat_set.mp4
+    python benchmark.py squat --video recordings/squat_set.mp4 --decoder pyav --width 640
+    python benchmark.py plank --synthetic --frames 300
+    python benchmark.py squat --synthetic --frames 300 --sessions 4 --no-motion-gate
+    python benchmark.py squat --synthetic --frames 300 --sessions 4 --processes 4
+    python benchmark.py squat --video recordings/squat_set.mp4 --roi
+    python benchmark.py squat --video recordings/squat_set.mp4 --inference-size 256
+    python benchmark.py squat --video recordings/squat_set.mp4 --scales 192,256,320,480
+    python benchmark.py squat --video recordings/squat_set.mp4 --detect-every 3
+    python benchmark.py squat --video recordings/squat_set.mp4 --backend tasks
+    python benchmark.py squat --video recordings/squat_set.mp4 --backend tflite --threads 2 --roi
+    python benchmark.py squat --video recordings/squat_set.mp4 --backend onnx --model pose_landmark_full.onnx --roi
+    python benchmark.py squat --video recordings/squat_set.mp4 --landmark-cache landmark_cache
+    python benchmark.py squat --video recordings/class.mp4 --people 4 --processes 4
+    python benchmark.py squat --video recordings/squat_set.mp4 --sessions 4 --thread-sweep
+    python benchmark.py plank --angles 4
+"""
+import argparse
+import itertools
+import os
+import time
+import threading
+
+# Let pygame initialise its mixer on headless machines
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+# Same BLAS limit as the app, set before numpy loads
+from thread_budget import ThreadBudget, available_cores, limit_blas_threads, threadpool_limits
+limit_blas_threads(int(os.environ.get('BLAS_THREADS', 1)))
+
+import numpy as np
+from frame_sources import SyntheticSource, open_video
+from exercises import exercise_map, tracker_map
+from exercises.base import stream_exercise, stream_group_exercise
+from motion import MotionGate
+from roi import RoiTracker
+from prediction import LandmarkPredictor
+from landmark_cache import LandmarkCache
+from pose_pool import PosePool, pose_pool
+from inference_workers import ProcessPosePool
+from pose_tasks import LiveStreamPose
+from pose_backends import create_backend
+from utils import calculate_angle, calculate_angles
+
+
+class SilentSound:
+    """
+    Sound stand-in that does nothing, so benchmarks measure only the pipeline
+    """
+    def play(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def run_benchmark(exercise, source, max_frames=None, **options):
+    """
+    Drive an exercise generator over a source until it ends
+
+    Args:
+        exercise: Exercise ID from exercise_map
+        source: Frame source to replay
+        max_frames: Stop after this many frames (None for the whole source)
+        **options: Options passed on to stream_exercise
+
+    Returns:
+        Dictionary with frame count, elapsed seconds and frames per second
+    """
+    start = time.perf_counter()
+    frames = drive(exercise_map[exercise](SilentSound(), source, **options), source, max_frames)
+    elapsed = time.perf_counter() - start
+    return {
+        'exercise': exercise,
+        'frames': frames,
+        'elapsed': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def drive(generator, source, max_frames=None):
+    """
+    Consume a stream generator, then close it and release its source
+
+    Returns:
+        Number of frames produced
+    """
+    frames = 0
+    try:
+        for _ in generator:
+            frames += 1
+            if max_frames is not None and frames >= max_frames:
+                break
+    finally:
+        generator.close()
+        source.release()
+    return frames
+
+
+def rep_counts(tracker):
+    """
+    Read the rep counters of a tracker
+
+    Returns:
+        Dictionary of counter name to value, for the counters the tracker has
+    """
+    if isinstance(getattr(tracker, 'counters', None), dict):
+        return dict(tracker.counters)
+    return {name: getattr(tracker, name) for name in ('counter', 'left_counter', 'right_counter')
+            if hasattr(tracker, name)}
+
+
+def run_scale_sweep(exercise, make_source, scales, max_frames=None, make_options=dict):
+    """
+    Replay the same source at several inference sizes and compare rep counts
+
+    The run at full resolution is the reference, every scaled run reports
+    its throughput and how many reps it counted differently.
+
+    Args:
+        exercise: Exercise ID from tracker_map
+        make_source: Callable returning a new frame source
+        scales: Inference sizes (longest side in pixels) to compare
+        max_frames: Frame limit per run
+        make_options: Callable returning the options passed on to
+            stream_exercise
+
+    Returns:
+        List of dictionaries with inference size, frames per second, rep
+        counts and the total rep difference from the reference
+    """
+    results = []
+    reference = None
+    for size in [None] + list(scales):
+        tracker = tracker_map[exercise](SilentSound())
+        source = make_source()
+        start = time.perf_counter()
+        frames = drive(stream_exercise(tracker, source, inference_size=size, **make_options()), source, max_frames)
+        elapsed = time.perf_counter() - start
+
+        counts = rep_counts(tracker)
+        if reference is None:
+            reference = counts
+        results.append({
+            'inference_size': size,
+            'fps': frames / elapsed if elapsed > 0 else 0.0,
+            'reps': counts,
+            'rep_error': sum(abs(counts[name] - reference[name]) for name in counts)
+        })
+    return results
+
+
+def run_sessions(exercise, make_source, sessions, max_frames=None, make_options=dict):
+    """
+    Run several benchmark sessions at once, each on its own source
+
+    Args:
+        exercise: Exercise ID from exercise_map
+        make_source: Callable returning a new frame source
+        sessions: Number of concurrent sessions
+        max_frames: Frame limit per session
+        make_options: Callable returning the options passed on to
+            stream_exercise, called per session since gates and trackers
+            hold per stream state
+
+    Returns:
+        Dictionary with total frames, elapsed seconds and combined frames per second
+    """
+    results = [None] * sessions
+
+    def run(index):
+        results[index] = run_benchmark(exercise, make_source(), max_frames, **make_options())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    frames = sum(result['frames'] for result in results)
+    return {
+        'exercise': exercise,
+        'sessions': sessions,
+        'frames': frames,
+        'elapsed': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def run_group(exercise, source, people, max_frames=None, pool=None):
+    """
+    Track several athletes in one source and report throughput and reps
+
+    Args:
+        exercise: Exercise ID from tracker_map
+        source: Frame source to replay
+        people: Most athletes tracked at once
+        max_frames: Stop after this many frames (None for the whole source)
+        pool: Pool the athletes' Pose graphs are checked out of
+
+    Returns:
+        Dictionary with frame count, elapsed seconds, frames per second and
+        the rep counts of every athlete tracked at the end
+    """
+    trackers = []
+
+    class RecordedTracker(tracker_map[exercise]):
+        # Keeps every athlete's tracker, the group drops lost athletes
+        def __init__(self):
+            super().__init__()
+            trackers.append(self)
+
+    start = time.perf_counter()
+    frames = drive(stream_group_exercise(RecordedTracker, source, max_people=people, pool=pool), source,
+                   max_frames)
+    elapsed = time.perf_counter() - start
+    return {
+        'exercise': exercise,
+        'frames': frames,
+        'elapsed': elapsed,
+        'fps': frames / elapsed if elapsed > 0 else 0.0,
+        'reps': [rep_counts(tracker) for tracker in trackers]
+    }
+
+
+def run_thread_sweep(exercise, make_source, plans, sessions=1, max_frames=None, make_pool=None,
+                     make_options=dict):
+    """
+    Replay the same sessions under several thread budgets
+
+    Args:
+        exercise: Exercise ID from exercise_map
+        make_source: Callable returning a new frame source
+        plans: Dictionaries with opencv, inference and blas thread counts
+        sessions: Number of concurrent sessions per run
+        max_frames: Frame limit per session
+        make_pool: Callable taking the inference thread count and returning
+            the pool for a run (None uses the options' pool)
+        make_options: Callable returning the options passed on to
+            stream_exercise
+
+    Returns:
+        List of dictionaries with the plan and the combined frames per second
+    """
+    results = []
+    for plan in plans:
+        ThreadBudget(opencv_threads=plan['opencv'], inference_threads=plan['inference'],
+                     blas_threads=plan['blas']).apply()
+        pool = make_pool(plan['inference']) if make_pool else None
+        run_options = (lambda: dict(make_options(), pool=pool)) if pool else make_options
+        try:
+            result = run_sessions(exercise, make_source, sessions, max_frames, run_options)
+        finally:
+            if hasattr(pool, 'shutdown'):
+                pool.shutdown()
+        results.append({'plan': plan, 'fps': result['fps']})
+    return results
+
+
+def run_angle_benchmark(joints=6, frames=10000):
+    """
+    Time the joint angles of a frame computed one by one and in one call
+
+    Args:
+        joints: Angles computed per frame
+        frames: Number of random frames to time
+
+    Returns:
+        Dictionary with microseconds per frame for both ways
+    """
+    points = np.random.default_rng(0).random((frames, joints, 3, 2), dtype=np.float32)
+    lists = points.tolist()
+
+    start = time.perf_counter()
+    for frame in lists:
+        for a, b, c in frame:
+            calculate_angle(a, b, c)
+    scalar = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for frame in points:
+        calculate_angles(frame)
+    batched = time.perf_counter() - start
+    return {
+        'joints': joints,
+        'scalar_us': scalar / frames * 1e6,
+        'batched_us': batched / frames * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark exercise trackers on recorded or synthetic frames")
+    parser.add_argument('exercise', choices=sorted(exercise_map))
+    parser.add_argument('--video', help="Recorded video file to replay")
+    parser.add_argument('--synthetic', action='store_true', help="Use generated frames instead of a recording")
+    parser.add_argument('--frames', type=int, default=None, help="Maximum number of frames to process")
+    parser.add_argument('--decoder', choices=['auto', 'pyav', 'opencv'], default='auto',
+                        help="Video decoder (auto uses PyAV when installed)")
+    parser.add_argument('--width', type=int, default=None, help="Scale decoded frames to this width (PyAV only)")
+    parser.add_argument('--start', type=int, default=0, help="Frame index to start from (PyAV only)")
+    parser.add_argument('--sessions', type=int, default=1, help="Number of concurrent sessions")
+    parser.add_argument('--no-motion-gate', action='store_true',
+                        help="Run pose detection on every frame, even static ones")
+    parser.add_argument('--processes', type=int, default=0,
+                        help="Run pose detection in this many separate processes")
+    parser.add_argument('--roi', action='store_true', help="Crop pose detection to the athlete")
+    parser.add_argument('--inference-size', type=int, default=None,
+                        help="Longest side in pixels of the images pose detection runs on")
+    parser.add_argument('--scales', help="Compare rep counts at these comma separated inference sizes")
+    parser.add_argument('--backend', choices=['solutions', 'tasks', 'mediapipe', 'onnx', 'tflite'],
+                        default='solutions',
+                        help="Pose detection runtime (tasks runs the PoseLandmarker asynchronously)")
+    parser.add_argument('--threads', type=int, default=None, help="Threads per inference (onnx and tflite)")
+    parser.add_argument('--model', help="Model file for the onnx and tflite backends")
+    parser.add_argument('--landmark-cache', metavar='DIR',
+                        help="Reuse landmarks detected on earlier replays of the video, kept in DIR")
+    parser.add_argument('--thread-sweep', action='store_true',
+                        help="Compare OpenCV, inference and BLAS thread counts for the sessions")
+    parser.add_argument('--angles', type=int, metavar='JOINTS',
+                        help="Time computing this many joint angles per frame one by one and batched")
+    parser.add_argument('--people', type=int, default=1, help="Track up to this many athletes in the frame")
+    parser.add_argument('--detect-every', type=int, default=1,
+                        help="Run pose detection on every Nth frame and predict the others")
+    args = parser.parse_args()
+
+    if args.angles:
+        result = run_angle_benchmark(args.angles)
+        print(f"{result['joints']} angles per frame: {result['scalar_us']:.1f} us one by one, "
+              f"{result['batched_us']:.1f} us batched")
+        return
+
+    if args.video:
+        options = {}
+        if args.width:
+            options['width'] = args.width
+        if args.start:
+            options['start_frame'] = args.start
+        make_source = lambda: open_video(args.video, decoder=args.decoder, **options)
+    elif args.synthetic:
+        make_source = lambda: SyntheticSource(num_frames=args.frames or 300)
+    else:
+        parser.error("either --video or --synthetic is required")
+
+    def make_pool(threads=args.threads):
+        if args.processes:
+            return ProcessPosePool(args.processes)
+        if args.backend == 'tasks':
+            return PosePool(factory=LiveStreamPose)
+        if args.backend != 'solutions':
+            return PosePool(factory=lambda level: create_backend(args.backend, level, threads, args.model))
+        return pose_pool
+
+    pool = None if args.thread_sweep else make_pool()
+
+    landmark_cache = LandmarkCache(args.landmark_cache) if args.landmark_cache else None
+
+    def make_options():
+        options = {'pool': pool, 'landmark_cache': landmark_cache}
+        if args.inference_size and not args.scales:
+            options['inference_size'] = args.inference_size
+        if args.no_motion_gate:
+            options['motion_gate'] = MotionGate(refresh_interval=1)
+        if args.roi:
+            options['roi'] = RoiTracker()
+        if args.detect_every > 1:
+            options['predictor'] = LandmarkPredictor(args.detect_every)
+        return options
+
+    try:
+        if args.thread_sweep:
+            cores = available_cores()
+            counts = sorted({1, max(1, cores // args.sessions), cores})
+            # Without threadpoolctl the BLAS limit can only be set at startup
+            blas_counts = counts if threadpool_limits is not None else [int(os.environ.get('BLAS_THREADS', 1))]
+            # Only the onnx and tflite graphs take a thread count, the solutions
+            # and tasks graphs and the inference processes size their own pools,
+            # so sweeping it for them would time the same setup several times
+            if args.backend in ('onnx', 'tflite') and not args.processes:
+                inference_counts = counts
+            else:
+                inference_counts = [None]
+                print(f"Inference threads are not swept, the {args.backend} graphs size their own pool")
+            plans = [{'opencv': opencv, 'inference': inference, 'blas': blas}
+                     for opencv, inference, blas in itertools.product(counts, inference_counts, blas_counts)]
+            results = run_thread_sweep(args.exercise, make_source, plans, args.sessions, args.frames, make_pool,
+                                       make_options)
+            for result in results:
+                print(f"{result['plan']}: {result['fps']:.1f} fps combined")
+            best = max(results, key=lambda result: result['fps'])
+            print(f"Best for {args.sessions} sessions on {cores} cores: {best['plan']}")
+        elif args.scales:
+            scales = [int(size) for size in args.scales.split(',')]
+            for result in run_scale_sweep(args.exercise, make_source, scales, args.frames, make_options):
+                size = result['inference_size'] or 'full'
+                print(f"{args.exercise} at {size}: {result['fps']:.1f} fps, reps {result['reps']}, "
+                      f"{result['rep_error']} reps off the full resolution run")
+        elif args.people > 1:
+            result = run_group(args.exercise, make_source(), args.people, args.frames, pool)
+            print(f"{result['exercise']}: {result['frames']} frames in {result['elapsed']:.2f}s "
+                  f"({result['fps']:.1f} fps), reps per athlete {result['reps']}")
+        elif args.sessions > 1:
+            result = run_sessions(args.exercise, make_source, args.sessions, args.frames, make_options)
+            print(f"{result['exercise']}: {result['sessions']} sessions, {result['frames']} frames in "
+                  f"{result['elapsed']:.2f}s ({result['fps']:.1f} fps combined)")
+            print(f"Pose pool: {pool.stats()}")
+        else:
+            result = run_benchmark(args.exercise, make_source(), args.frames, **make_options())
+            print(f"{result['exercise']}: {result['frames']} frames in {result['elapsed']:.2f}s "
+                  f"({result['fps']:.1f} fps)")
+    finally:
+        if pool is not None and args.processes:
+            pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import threading
+
+
+class Broadcast:
+    """
+    A single producer whose output chunks are shared by many viewers
+
+    The producer generator runs on its own thread. Each new chunk replaces
+    the previous one, so a slow viewer skips chunks instead of holding back
+    the producer or the other viewers.
+
+    Args:
+        key: Key the broadcast is registered under
+        start: Callable returning the producer generator
+    """
+
+    def __init__(self, key, start):
+        self.key = key
+        self.subscribers = 0
+        self.chunks_produced = 0
+        self.stopped = False
+        self.ended = False
+        self._start = start
+        self._chunk = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        generator = None
+        try:
+            generator = self._start()
+            for chunk in generator:
+                with self._condition:
+                    if self.stopped:
+                        break
+                    self._chunk = chunk
+                    self.chunks_produced += 1
+                    self._condition.notify_all()
+        except Exception as e:
+            print(f"Error in broadcast {self.key}: {e}")
+        finally:
+            # Closing the producer lets it release its capture
+            if generator is not None:
+                generator.close()
+            with self._condition:
+                self.ended = True
+                self._condition.notify_all()
+            print(f"Broadcast stopped: {self.key}")
+
+    def next_chunk(self, last_seen, timeout=1.0):
+        """
+        Wait for a chunk newer than the one a viewer has already sent
+
+        Args:
+            last_seen: Chunk number the viewer sent last
+            timeout: Seconds to wait before returning without a chunk
+
+        Returns:
+            Tuple (chunk, chunk number); chunk is None on timeout or when
+            the producer has ended
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self.chunks_produced > last_seen or self.ended,
+                timeout=timeout
+            )
+            if self.chunks_produced > last_seen:
+                return self._chunk, self.chunks_produced
+            return None, last_seen
+
+    def stop(self):
+        with self._condition:
+            self.stopped = True
+            self._condition.notify_all()
+
+
+class Broadcaster:
+    """
+    Registry of running broadcasts, one per key (for example source + exercise)
+
+    The first viewer of a key starts its producer, later viewers share it,
+    and the producer is stopped when the last viewer leaves.
+    """
+
+    def __init__(self):
+        self._broadcasts = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, key, start):
+        """
+        Join the broadcast for a key, starting it if needed
+
+        Args:
+            key: Hashable broadcast key
+            start: Callable returning the producer generator, only called
+                when no broadcast is running for the key
+
+        Returns:
+            Generator yielding the broadcast's chunks for this viewer
+        """
+        with self._lock:
+            broadcast = self._broadcasts.get(key)
+            if broadcast is None or broadcast.stopped or broadcast.ended:
+                broadcast = Broadcast(key, start)
+                self._broadcasts[key] = broadcast
+                broadcast.start()
+                print(f"Broadcast started: {key}")
+            broadcast.subscribers += 1
+
+        return self._stream(broadcast)
+
+    def _stream(self, broadcast):
+        last_seen = 0
+        try:
+            while True:
+                chunk, last_seen = broadcast.next_chunk(last_seen)
+                if chunk is not None:
+                    yield chunk
+                elif broadcast.ended:
+                    break
+        finally:
+            self._unsubscribe(broadcast)
+
+    def _unsubscribe(self, broadcast):
+        with self._lock:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers > 0:
+                return
+
+            # Last viewer left, tear the producer down
+            broadcast.stop()
+            if self._broadcasts.get(broadcast.key) is broadcast:
+                del self._broadcasts[broadcast.key]
+
+    def stats(self):
+        """
+        Running broadcasts and their viewer counts
+
+        Returns:
+            List of dictionaries, one per broadcast
+        """
+        with self._lock:
+            return [
+                {
+                    'key': str(broadcast.key),
+                    'subscribers': broadcast.subscribers,
+                    'chunks_produced': broadcast.chunks_produced
+                }
+                for broadcast in self._broadcasts.values()
+            ]
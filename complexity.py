@@ -0,0 +1,116 @@
+class ComplexityController:
+    """
+    Picks the MediaPipe model_complexity of one stream to hold a latency target
+
+    The controller watches how long pose detection takes on each frame. When
+    the average stays above the target it steps down to a lighter model, and
+    when it stays well below the target it steps back up. The two thresholds
+    and the number of frames a condition has to hold give hysteresis, so a
+    stream under steady load settles on one level instead of flipping between
+    two. After a switch the average starts over and no further switch is made
+    for `cooldown_frames`, since the new graph needs a few frames to settle.
+
+    Args:
+        target_ms: Detection latency to hold in milliseconds (None or 0
+            keeps the starting level)
+        level: Starting model complexity
+        lowest: Lightest complexity the controller may choose
+        highest: Heaviest complexity the controller may choose
+        upgrade_ratio: Step up only while latency is below this share of the
+            target, a heavier model roughly doubles the latency
+        hold_frames: Consecutive frames a condition must hold before switching
+        cooldown_frames: Frames after a switch before the next one
+    """
+
+    # Weight of the newest frame in the running average
+    SMOOTHING = 0.2
+
+    def __init__(self, target_ms=None, level=1, lowest=0, highest=2, upgrade_ratio=0.45, hold_frames=15,
+                 cooldown_frames=30):
+        self.target = target_ms / 1000.0 if target_ms else None
+        self.level = level
+        self.lowest = lowest
+        self.highest = highest
+        self.upgrade_ratio = upgrade_ratio
+        self.hold_frames = hold_frames
+        self.cooldown_frames = cooldown_frames
+        self.latency = 0.0  # Running average of seconds per detection at the current level
+        self.switches = 0
+        self._samples = 0
+        self._over = 0
+        self._under = 0
+        self._cooldown = 0
+
+    def update(self, latency):
+        """
+        Record the latency of one detection and choose the level for the next
+
+        Args:
+            latency: Seconds the detection took
+
+        Returns:
+            Model complexity to use for the next frame
+        """
+        if self._samples == 0:
+            self.latency = latency
+        else:
+            self.latency += self.SMOOTHING * (latency - self.latency)
+        self._samples += 1
+
+        if self.target is None:
+            return self.level
+        if self._cooldown > 0:
+            self._cooldown -= 1
+            return self.level
+
+        self._over = self._over + 1 if self.latency > self.target else 0
+        self._under = self._under + 1 if self.latency < self.target * self.upgrade_ratio else 0
+
+        if self._over >= self.hold_frames and self.level > self.lowest:
+            self._switch(self.level - 1)
+        elif self._under >= self.hold_frames and self.level < self.highest:
+            self._switch(self.level + 1)
+        return self.level
+
+    def _switch(self, level):
+        print(f"Model complexity {self.level} -> {level} "
+              f"(detection {self.latency * 1000:.0f} ms, target {self.target * 1000:.0f} ms)")
+        self.level = level
+        self.switches += 1
+        self._samples = 0
+        self._over = 0
+        self._under = 0
+        self._cooldown = self.cooldown_frames
+
+    def revert(self, level, permanent=False):
+        """
+        Go back to a level after the switch away from it could not be made
+
+        Args:
+            level: Level the stream is still running
+            permanent: The level switched to can never be used (e.g. its
+                model is missing), keep the controller away from it
+        """
+        if permanent:
+            if self.level < level:
+                self.lowest = self.level + 1
+            else:
+                self.highest = self.level - 1
+        self.level = level
+        self.switches -= 1
+        self._cooldown = self.cooldown_frames
+
+    def stats(self):
+        """
+        Controller state for monitoring
+
+        Returns:
+            Dictionary with the chosen level, the latency target, the average
+            detection latency and the number of switches
+        """
+        return {
+            'model_complexity': self.level,
+            'target_ms': round(self.target * 1000, 1) if self.target else None,
+            'latency_ms': round(self.latency * 1000, 1),
+            'switches': self.switches
+        }
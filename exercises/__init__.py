@@ -0,0 +1,39 @@
+from exercises.bicep_curl import HummerTracker, hummer
+from exercises.front_raise import FrontRaiseTracker, dumbbell_front_raise
+from exercises.squat import SquatTracker, squat
+from exercises.triceps_extension import TricepsExtensionTracker, triceps_extension
+from exercises.lunges import LungesTracker, lunges
+from exercises.shoulder_press import ShoulderPressTracker, shoulder_press
+from exercises.plank import PlankTracker, plank
+from exercises.lateral_raise import LateralRaiseTracker, side_lateral_raise
+from exercises.triceps_kickback import TricepsKickbackTracker, triceps_kickback_side
+from exercises.push_ups import PushUpsTracker, push_ups
+
+# Dictionary to store exercise functions
+exercise_map = {
+    'hummer': hummer,
+    'front_raise': dumbbell_front_raise,
+    'squat': squat,
+    'triceps': triceps_extension,
+    'lunges': lunges,
+    'shoulder_press': shoulder_press,
+    'plank': plank,
+    'side_lateral_raise': side_lateral_raise,
+    'triceps_kickback_side': triceps_kickback_side,
+    'push_ups': push_ups
+}
+
+# Dictionary to store the rules of each exercise, used when the client
+# detects landmarks itself and only uploads them
+tracker_map = {
+    'hummer': HummerTracker,
+    'front_raise': FrontRaiseTracker,
+    'squat': SquatTracker,
+    'triceps': TricepsExtensionTracker,
+    'lunges': LungesTracker,
+    'shoulder_press': ShoulderPressTracker,
+    'plank': PlankTracker,
+    'side_lateral_raise': LateralRaiseTracker,
+    'triceps_kickback_side': TricepsKickbackTracker,
+    'push_ups': PushUpsTracker
+}
@@ -0,0 +1,448 @@
+import os
+import time
+import cv2
+import numpy as np
+import pygame
+from complexity import ComplexityController
+from frame_buffers import FrameArena
+from frame_sources import frame_timestamp, open_source
+from motion import IdleMonitor, MotionGate, waiting_frame
+from multi_person import GroupTracker, draw_person
+from pacing import FramePacer
+from pose_pool import pose_pool
+from utils import POSE_OPTIONS, as_landmark_list, landmark_array
+
+
+class ExerciseTracker:
+    """
+    Rep counting and form rules for one exercise
+
+    The rules only need pose landmarks, so the same tracker runs on landmarks
+    detected on the server and on landmarks uploaded by a browser that runs
+    the pose model itself. Drawing and audio cues are only used when the
+    server streams annotated video.
+
+    Args:
+        sound: Pygame sound object for alerts (None when no audio is played)
+    """
+    # Mirror the camera image before detection
+    flip = True
+
+    # Size of the frames the landmarks were detected on, for rules in pixels
+    frame_size = (640, 480)
+
+    def __init__(self, sound=None):
+        self.sound = sound
+
+    def update(self, landmarks):
+        """
+        Apply the exercise rules to one frame of landmarks
+
+        Args:
+            landmarks: float32 (33, 4) array of the pose landmarks' x, y, z
+                and visibility, see utils.landmark_array()
+
+        Returns:
+            Dictionary with counters, stage and form feedback
+        """
+        raise NotImplementedError
+
+    def load_audio(self):
+        """
+        Prepare audio cues before streaming starts
+        """
+        pass
+
+    def play_feedback(self, summary):
+        """
+        Start or stop audio cues for the result of update()
+        """
+        pass
+
+    def draw(self, image, landmarks, summary):
+        """
+        Draw the tracker overlay on a BGR frame
+        """
+        pass
+
+    def close(self):
+        """
+        Stop any audio still playing when the stream ends
+        """
+        pass
+
+
+class VoiceTracker(ExerciseTracker):
+    """
+    Tracker that speaks one instruction at a time while the form is wrong
+
+    Subclasses set `instructions` (violation key to spoken text) and
+    `voice_prefix`, and report the current violation key in the
+    'violation' entry of their update() result.
+    """
+    instructions = {}
+    voice_prefix = ''
+
+    def __init__(self, sound=None):
+        super().__init__(sound)
+        self.voice_objects = {}  # Dictionary to store voice instruction sound objects
+        self.voice_playing = False  # Flag to track if voice is playing
+        self.current_instruction = None  # Track current instruction being played
+
+    def load_audio(self):
+        self.voice_objects = load_voices(self.instructions, self.voice_prefix)
+
+    def play_feedback(self, summary):
+        current_violation = summary['violation']
+
+        if not summary['form_ok'] and current_violation:
+            # If violation detected and voice not playing or playing a different instruction
+            if not self.voice_playing or self.current_instruction != current_violation:
+                # Stop any current playback
+                pygame.mixer.stop()
+
+                # Play the appropriate voice instruction
+                if current_violation in self.voice_objects:
+                    self.voice_objects[current_violation].play()
+                    self.voice_playing = True
+                    self.current_instruction = current_violation
+                    print(f"Playing instruction: {current_violation}")
+                else:
+                    print(f"Warning: Missing voice for {current_violation}")
+        elif self.voice_playing:
+            # Stop voice playback when form is corrected
+            pygame.mixer.stop()
+            self.voice_playing = False
+            self.current_instruction = None
+            print("Form corrected, stopping voice guidance")
+
+    def close(self):
+        if pygame.mixer.get_init():
+            pygame.mixer.stop()
+
+
+def load_voices(messages, prefix=''):
+    """
+    Load spoken instructions, generating missing audio files with gTTS
+
+    Args:
+        messages: Dictionary of instruction key to text
+        prefix: File name prefix inside the audio directory
+
+    Returns:
+        Dictionary of instruction key to pygame Sound
+    """
+    # Initialize pygame mixer if not already initialized
+    if not pygame.mixer.get_init():
+        pygame.mixer.init()
+
+    # Create audio directory if it doesn't exist
+    os.makedirs("audio", exist_ok=True)
+
+    voice_objects = {}
+
+    # Generate voice instructions if needed
+    try:
+        from gtts import gTTS
+
+        for key, message in messages.items():
+            filepath = f"audio/{prefix}{key}.mp3"
+
+            # Create audio file if it doesn't exist
+            if not os.path.exists(filepath):
+                print(f"Creating voice instruction: {filepath}")
+                tts = gTTS(text=message, lang='en')
+                tts.save(filepath)
+
+            # Load sound object
+            voice_objects[key] = pygame.mixer.Sound(filepath)
+    except ImportError:
+        print("gTTS not available, voice files must be created manually")
+    except Exception as e:
+        print(f"Error with voice setup: {e}")
+
+    return voice_objects
+
+
+def mjpeg_chunk(jpeg):
+    """
+    Wrap an encoded JPEG as one part of a multipart MJPEG response
+
+    Args:
+        jpeg: Encoded image, bytes or the array returned by cv2.imencode
+
+    Returns:
+        Bytes of the multipart chunk
+    """
+    # join() reads the encoder's array directly, saving the tobytes() copy
+    return b''.join((b'--frame\r\n'
+                     b'Content-Type: image/jpeg\r\n\r\n', jpeg, b'\r\n'))
+
+
+def detect_pose(pose, image, arena, roi=None, inference_size=None):
+    """
+    Run pose detection on a BGR frame
+
+    Args:
+        pose: Pose graph or backend
+        image: BGR frame the overlay is drawn on
+        arena: FrameArena for the detection buffers
+        roi: RoiTracker cropping detection to the athlete
+        inference_size: Longest side in pixels of the image detection runs on
+
+    Returns:
+        Landmarks in frame coordinates, or None when nobody was found
+    """
+    while True:
+        # Detection needs RGB, the overlay is drawn on the BGR image
+        region = roi.crop(image) if roi else image
+        cropped = region is not image
+        name = 'rgb_crop' if cropped else 'rgb'
+        long_side = max(region.shape[:2])
+        if inference_size and long_side > inference_size:
+            # Landmarks are normalized, so detection on a smaller copy
+            # needs no mapping back to the display frame
+            scale = inference_size / long_side
+            size = (round(region.shape[1] * scale), round(region.shape[0] * scale))
+            region = cv2.resize(region, size, dst=arena.get(name + '_small', (size[1], size[0], 3)),
+                                interpolation=cv2.INTER_AREA)
+        rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB, dst=arena.get(name, region.shape))
+        # Converted once here, every later step reads the same array
+        pose_landmarks = as_landmark_list(pose.process(rgb).pose_landmarks)
+        if roi is None:
+            return pose_landmarks
+        pose_landmarks = roi.update(pose_landmarks, image.shape)
+        if pose_landmarks is not None or not cropped:
+            return pose_landmarks
+        # Lost the athlete in the crop, look at the whole frame
+
+
+def stream_exercise(tracker, source=None, motion_gate=None, idle_monitor=None, pacer=None, arena=None,
+                    pool=None, complexity=None, roi=None, inference_size=None, predictor=None,
+                    landmark_cache=None):
+    """
+    Run a tracker over a frame source and stream the annotated frames
+
+    Args:
+        tracker: ExerciseTracker for the exercise
+        source: Frame source to read from (defaults to the local camera)
+        motion_gate: MotionGate deciding when pose detection can be skipped
+            (defaults to one with the standard thresholds)
+        idle_monitor: IdleMonitor throttling live sources while nobody is in
+            view (defaults to one with the standard timings)
+        pacer: FramePacer holding the stream to a target frame rate
+            (defaults to no pacing)
+        arena: FrameArena with the stream's reusable image buffers
+        pool: PosePool to check the stream's Pose graph out of (defaults to
+            the process wide pool)
+        complexity: ComplexityController choosing the model complexity from
+            the detection latency (defaults to a fixed complexity)
+        roi: RoiTracker cropping detection to the athlete (defaults to
+            detection on the full frame)
+        inference_size: Longest side in pixels of the image detection runs
+            on, larger frames are scaled down for detection while the
+            overlay is drawn at full size (defaults to no scaling)
+        predictor: LandmarkPredictor running detection on every Nth frame
+            and predicting the others (defaults to detection on every frame)
+        landmark_cache: LandmarkCache reusing the landmarks detected on
+            earlier replays of a video file (defaults to no cache)
+
+    Yields:
+        Video frames with pose tracking
+    """
+    pool = pool or pose_pool
+    complexity = complexity or ComplexityController()
+    cap = open_source(source)
+    try:
+        pose = pool.acquire(model_complexity=complexity.level)
+    except Exception:
+        if cap is not source:
+            cap.release()
+        raise
+    gate = motion_gate or MotionGate()
+    idle = idle_monitor or IdleMonitor()
+    pacer = pacer or FramePacer()
+    arena = arena or FrameArena()
+    # Recordings are analysed frame by frame, only live sources go idle
+    live = getattr(cap, 'live', False)
+    complexity_in_use = complexity.level
+    cached_video = None
+    cached_level = None
+    pose_landmarks = None
+    waiting_chunk = None
+    detections = 0  # Frames detection ran on, not served by prediction or the cache
+    tracker.load_audio()
+
+    try:
+        while cap.isOpened():
+            pacer.wait()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            pacer.begin()
+            if predictor:
+                # Time moves on for the prediction on every frame, detected or not
+                predictor.advance(frame_timestamp(cap))
+
+            # Draw on the stream's own buffer, the source may still hold the frame
+            image = arena.get('image', frame.shape)
+            if tracker.flip:
+                # Flip the frame horizontally
+                cv2.flip(frame, 1, dst=image)
+            else:
+                np.copyto(image, frame)
+
+            if landmark_cache and cached_video is None and not live and os.path.isfile(getattr(cap, 'path', '')):
+                # Everything the detected landmarks depend on goes into the key
+                cached_level = complexity_in_use
+                cached_video = landmark_cache.open(
+                    cap.path,
+                    backend=type(pose).__name__,
+                    model_complexity=cached_level,
+                    min_detection_confidence=POSE_OPTIONS['min_detection_confidence'],
+                    min_tracking_confidence=POSE_OPTIONS['min_tracking_confidence'],
+                    inference_size=inference_size,
+                    roi=roi is not None,
+                    flip=tracker.flip,
+                    frame_size=list(image.shape[:2])
+                )
+
+            # Every idle probe runs detection, otherwise reuse the last
+            # landmarks while nothing in the frame moves
+            if idle.active:
+                gate.reset()
+            process = gate.should_process(image)
+            if process and predictor and not predictor.due():
+                # Between detections, extrapolate from the last ones
+                pose_landmarks = predictor.predict()
+                process = False
+            if process:
+                hit = False
+                if cached_video is not None:
+                    hit, pose_landmarks = cached_video.lookup(cap.frame_index - 1)
+                if hit:
+                    if roi:
+                        roi.follow(pose_landmarks, image.shape)
+                else:
+                    start = time.perf_counter()
+                    pose_landmarks = detect_pose(pose, image, arena, roi, inference_size)
+                    detections += 1
+                    if cached_video is not None and complexity_in_use == cached_level:
+                        cached_video.store(cap.frame_index - 1, pose_landmarks)
+
+                    # Asynchronous graphs return at once and report their own latency
+                    level = complexity.update(getattr(pose, 'latency', None) or time.perf_counter() - start)
+                    if level != complexity_in_use:
+                        # Swap to a graph of the new complexity, tracking restarts on
+                        # it. Keep the current graph if no other one can be had now.
+                        try:
+                            new_pose = pool.acquire(timeout=0, model_complexity=level)
+                        except TimeoutError:
+                            complexity.revert(complexity_in_use)
+                        except Exception as e:
+                            print(f"Model complexity {level} unavailable: {e}")
+                            complexity.revert(complexity_in_use, permanent=True)
+                        else:
+                            pool.release(pose)
+                            pose = new_pose
+                            complexity_in_use = level
+                if predictor:
+                    pose_landmarks = predictor.observe(pose_landmarks)
+
+            if live and idle.update(pose_landmarks is not None):
+                # Nobody in view, resend the cached waiting frame and probe slowly
+                if waiting_chunk is None:
+                    ret, buffer = cv2.imencode('.jpg', waiting_frame(image))
+                    waiting_chunk = mjpeg_chunk(buffer)
+                pacer.end()
+                yield waiting_chunk
+                time.sleep(idle.probe_interval)
+                continue
+            waiting_chunk = None
+
+            if pose_landmarks:
+                landmarks = landmark_array(pose_landmarks)
+                tracker.frame_size = (image.shape[1], image.shape[0])
+                summary = tracker.update(landmarks)
+                summary['predicted'] = getattr(pose_landmarks, 'predicted', False)
+                if not summary['predicted']:
+                    # Audio cues only follow detected poses
+                    tracker.play_feedback(summary)
+                tracker.draw(image, landmarks, summary)
+
+            # Convert the image to JPEG format for streaming
+            ret, buffer = cv2.imencode('.jpg', image)
+            chunk = mjpeg_chunk(buffer)
+            pacer.end()
+
+            # Yield the frame to the Flask response
+            yield chunk
+    finally:
+        print(f"Pose detection ran on {detections} frames, skipped {gate.skipped} static frames")
+        if roi:
+            print(f"Pose detection cropping: {roi.stats()}")
+        if predictor:
+            print(f"Pose landmark prediction: {predictor.stats()}")
+        if cached_video is not None:
+            cached_video.save()
+            print(f"Landmark cache: {cached_video.stats()}")
+        tracker.close()
+        pool.release(pose)
+        # Only release captures opened here, callers own the sources they pass in
+        if cap is not source:
+            cap.release()
+
+
+def stream_group_exercise(tracker_class, source=None, max_people=4, pool=None, detector=None, pacer=None,
+                          arena=None):
+    """
+    Track several athletes doing the same exercise in one camera view
+
+    Every athlete gets their own tracker, so reps are counted per person.
+    Audio cues are not played, they could not tell the athletes apart.
+
+    Args:
+        tracker_class: ExerciseTracker class of the exercise
+        source: Frame source to read from (defaults to the local camera)
+        max_people: Most athletes tracked at once, bounds the work per frame
+        pool: PosePool the athletes' Pose graphs are checked out of
+            (defaults to the process wide pool)
+        detector: Person detector (defaults to PersonDetector)
+        pacer: FramePacer holding the stream to a target frame rate
+        arena: FrameArena with the stream's reusable image buffers
+
+    Yields:
+        Video frames with every tracked athlete marked
+    """
+    pool = pool or pose_pool
+    cap = open_source(source)
+    group = GroupTracker(tracker_class, pool, max_people, detector=detector)
+    pacer = pacer or FramePacer()
+    arena = arena or FrameArena()
+
+    try:
+        while cap.isOpened():
+            pacer.wait()
+            ret, frame = cap.read()
+            if not ret:
+                break
+            pacer.begin()
+
+            image = arena.get('image', frame.shape)
+            if tracker_class.flip:
+                cv2.flip(frame, 1, dst=image)
+            else:
+                np.copyto(image, frame)
+
+            for person in group.update(image, arena):
+                draw_person(image, person)
+
+            ret, buffer = cv2.imencode('.jpg', image)
+            chunk = mjpeg_chunk(buffer)
+            pacer.end()
+            yield chunk
+    finally:
+        print(f"Tracked {len(group.people)} athletes at the end of the stream")
+        group.close()
+        if cap is not source:
+            cap.release()
@@ -1,61 +1,62 @@
-import cv2
-from utils import calculate_angle, mp_pose, pose
+import numpy as np
+from exercises.base import stream_exercise
+from exercises.spec import ExerciseSpec, SpecTracker
+from utils import mp_pose
 
-def lunges(sound):
+# Landmark indices of the hip, knee and ankle of each leg
+SIDES = ('left', 'right')
+LEGS = np.array([
+    [mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.LEFT_KNEE, mp_pose.PoseLandmark.LEFT_ANKLE],
+    [mp_pose.PoseLandmark.RIGHT_HIP, mp_pose.PoseLandmark.RIGHT_KNEE, mp_pose.PoseLandmark.RIGHT_ANKLE]
+])
+
+# Shoulders and hips, averaged into the two ends of the torso line
+TORSO = np.array([
+    [mp_pose.PoseLandmark.LEFT_SHOULDER, mp_pose.PoseLandmark.RIGHT_SHOULDER],
+    [mp_pose.PoseLandmark.LEFT_HIP, mp_pose.PoseLandmark.RIGHT_HIP]
+])
+
+KNEE_DOWN_ANGLE = 100  # Front knee bent to about 90 degrees at the bottom
+KNEE_UP_ANGLE = 160  # Leg straight again at the top
+TORSO_MAX_LEAN = 20  # Maximum torso lean from vertical
+
+# Lunge rules and overlay
+LUNGES = ExerciseSpec(
+    sides=SIDES,
+    joints=LEGS,
+    angles={'knee_angle': (0, 1, 2)},
+    # Torso lean: angle between the hip-to-shoulder line and vertical
+    leans={'torso_angle': (TORSO[1], TORSO[0])},
+    phases=(('down', ('knee_angle', '<', KNEE_DOWN_ANGLE)), ('up', ('knee_angle', '>', KNEE_UP_ANGLE))),
+    rules=[(('torso_angle', '>', TORSO_MAX_LEAN), 'torso_upright')],
+    instructions={'torso_upright': "KEEP YOUR TORSO UPRIGHT!"},
+    per_side=True,
+    # Count repetitions only while the torso is upright
+    gated=True,
+    bones=[(0, 1), (1, 2)],
+    labels={'knee_angle': '{}°'},
+    counter_text='{side} Lunges: {count}'
+)
+
+
+class LungesTracker(SpecTracker):
+    """
+    Lunge rules: counts a rep for a leg when its knee bends below 100 degrees
+    and straightens past 160 while the torso stays upright
+    """
+    spec = LUNGES
+
+
+def lunges(sound, source=None, **options):
     """
     Track lunges exercise
-    
+
     Args:
         sound: Pygame sound object for alerts
-        
+        source: Frame source to read from (defaults to the local camera)
+        **options: Options passed on to stream_exercise
+
     Yields:
         Video frames with pose tracking
     """
-    left_counter = 0
-    right_counter = 0
-    left_stage = None
-    right_stage = None
-    cap = cv2.VideoCapture(0)
-    sound_playing = False
-    
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        # Flip the frame horizontally
-        frame = cv2.flip(frame, 1)
-        image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = pose.process(image)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-        
-        form_violated = False
-        
-        if results.pose_landmarks:
-            landmarks = results.pose_landmarks.landmark
-            
-            # Get leg landmarks for both legs
-            leg_sides = {
-                'left': {
-                    'hip': mp_pose.PoseLandmark.LEFT_HIP,
-                    'knee': mp_pose.PoseLandmark.LEFT_KNEE,
-                    'ankle': mp_pose.PoseLandmark.LEFT_ANKLE
-                },
-                'right': {
-                    'hip': mp_pose.PoseLandmark.RIGHT_HIP,
-                    'knee': mp_pose.PoseLandmark.RIGHT_KNEE,
-                    'ankle': mp_pose.PoseLandmark.RIGHT_ANKLE
-                }
-            }
-            
-            # Get coordinates for shoulders to check torso alignment
-            left_shoulder = [
-                landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER.value].y
-            ]
-            right_shoulder = [
-                landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].x,
-                landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER.value].y
-            ]
-            
-            # Draw
\ No newline at end of file
+    return stream_exercise(LungesTracker(sound), source, **options)
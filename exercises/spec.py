@@ -0,0 +1,509 @@
+import cv2
+import numpy as np
+from exercises.base import VoiceTracker
+from utils import calculate_angles, shade_rectangle, to_pixels
+
+# Comparisons a rule can use, as the sign the angle and threshold are
+# multiplied by to turn the rule into a "greater than" test, and whether the
+# test is strict
+OPERATORS = {
+    '<': (-1.0, True),
+    '<=': (-1.0, False),
+    '>': (1.0, True),
+    '>=': (1.0, False)
+}
+
+# Offset from a lean's base to the point above it that marks vertical
+VERTICAL = (0, 0.2)
+
+
+def compile_tests(tests):
+    """
+    Turn (operator, threshold) pairs into arrays tested with one comparison
+
+    Every test becomes `angle * sign > threshold`. Non-strict tests compare
+    against the next smaller float, which is exact for float64 angles.
+
+    Returns:
+        Tuple of the signs and adjusted thresholds
+    """
+    signs, thresholds = [], []
+    for operator, threshold in tests:
+        if operator not in OPERATORS:
+            raise ValueError(f"Unknown operator: {operator}")
+        sign, strict = OPERATORS[operator]
+        threshold = sign * threshold
+        signs.append(sign)
+        thresholds.append(threshold if strict else np.nextafter(threshold, -np.inf))
+    return np.array(signs, dtype=np.float64), np.array(thresholds, dtype=np.float64)
+
+
+class ExerciseSpec:
+    """
+    Declarative rules and overlay of an exercise, applied by SpecTracker
+
+    A spec names the joints of each body side, the angles and offsets
+    measured on them, the form rules and the two stages a rep moves between.
+    It is compiled into index and threshold arrays when it is created, so a
+    frame computes all of its angles in one calculate_angles() call and
+    evaluates all of its tests in one comparison.
+
+    A test is a (value, operator, threshold) tuple, and a condition is a test
+    or a list of tests that must all hold. A value is an angle, offset, lean
+    or difference name. Conditions on angles and offsets are checked on
+    every side, conditions only on leans and differences once per frame.
+
+    Sides are applied in order. With one counter a later side can finish
+    the rep an earlier side started, and a gated side is blocked by the
+    rules that failed on the leans and on the sides up to it.
+
+    Args:
+        sides: Names of the body sides, in the order they are applied
+        joints: Landmark indices of each side, one row per side
+        angles: Dictionary of angle name to the positions in a joints row
+            of its first, vertex and last joint. A first joint of None
+            measures the angle from vertical above the vertex.
+        phases: ((start stage, condition), (count stage, condition)). The
+            stage moves to the start stage while the start condition holds,
+            and a rep is counted when the count condition holds in the start
+            stage. The conditions must exclude each other. None times how
+            long the form rules pass instead of counting reps.
+        leans: Dictionary of lean name to (base, top) lists of landmark
+            indices, the angle from vertical of the line from the mean of
+            the base landmarks to the mean of the top ones
+        offsets: Dictionary of offset name to (start, end, axis) positions in
+            a joints row, the distance in pixels from start to end along x (0)
+            or y (1). A fourth True item measures the absolute distance.
+        differences: Dictionary of difference name to an angle, the absolute
+            difference between its values on the two sides
+        rules: List of (condition, violation) form rules, failing when the
+            condition holds. A violation of None fails the form without a
+            message.
+        initial_stage: Stage before the first rep
+        per_side: Count each side separately instead of with one counter
+        paired: Only move the stage when the condition holds on every side
+        gated: Only count reps while the form rules pass
+        gate_start: Also keep the stage while the form rules fail
+        rule_first: Pick the violation of the first rule failing on any
+            side, instead of the first failing rule of the first side
+        visible: Landmark index of each side, only the side whose landmark is
+            the most visible is applied
+        instructions: Dictionary of violation to its feedback message
+        side_violations: Dictionary of violation to its name when both sides
+            break it. Violations are then named after the sides breaking
+            any rule, left_ or right_ followed by the violation, or both_
+            followed by this name.
+        voice_prefix: File name prefix of the spoken instructions, None
+            plays the alert sound while the form is wrong instead
+        bones: Pairs of positions in a joints row drawn as lines
+        labels: Dictionary of angle name to the format of its label, drawn
+            at the angle's vertex
+        counter_text: Format of the counter, with {count} and per side {side}
+        feedback_scale: Font scale of the feedback message
+        show_form_status: Draw a form indicator under the counters
+        guidance: Lines of text drawn at the bottom of the frame
+    """
+
+    def __init__(self, sides, joints, angles, phases=None, leans=None, offsets=None, differences=None, rules=(),
+                 initial_stage=None, per_side=False, paired=False, gated=False, gate_start=False, rule_first=False,
+                 visible=None, instructions=None, side_violations=None, voice_prefix=None, bones=(), labels=None,
+                 counter_text='Counter: {count}', feedback_scale=1, show_form_status=False, guidance=()):
+        self.sides = tuple(sides)
+        self.joints = np.asarray(joints)
+        self.angles = dict(angles)
+        self.leans = dict(leans or {})
+        self.offsets = {name: tuple(offset) + (False,) * (4 - len(offset))
+                        for name, offset in (offsets or {}).items()}
+        self.differences = dict(differences or {})
+        self.hold = phases is None
+        self.initial_stage = initial_stage
+        self.per_side = per_side
+        self.paired = paired
+        self.gated = gated
+        self.gate_start = gate_start
+        self.visible = None if visible is None else np.asarray(visible)
+        self.instructions = dict(instructions or {})
+        self.side_violations = side_violations
+        self.voice_prefix = voice_prefix
+        self.bones = tuple(bones)
+        self.labels = dict(labels or {})
+        self.counter_text = counter_text
+        self.feedback_scale = feedback_scale
+        self.show_form_status = show_form_status
+        self.guidance = tuple(guidance)
+        if self.joints.shape[0] != len(self.sides):
+            raise ValueError("The joints need one row per side")
+        if self.differences and len(self.sides) != 2:
+            raise ValueError("Differences need two sides")
+
+        # Angles are computed leans first, then each side's angles side by
+        # side, with the vertex standing in for a vertical first joint
+        self.angle_joints = self.joints[:, [[vertex if first is None else first, vertex, last]
+                                            for first, vertex, last in self.angles.values()]].reshape(-1, 3)
+        self.vertical_rows = [len(self.leans) + side * len(self.angles) + angle
+                              for side in range(len(self.sides))
+                              for angle, (first, vertex, last) in enumerate(self.angles.values()) if first is None]
+        # Landmarks averaged into the lean lines, the bases of every lean then the tops
+        self.lean_points = np.array([base for base, top in self.leans.values()] +
+                                    [top for base, top in self.leans.values()], dtype=np.intp)
+        # Positions of the start and end of each side's offsets side by side
+        # in the flattened (33, 4) landmarks, the axis each is measured along
+        # and whether it is absolute
+        self.offset_axes = np.array([offset[2] for offset in self.offsets.values()] * len(self.sides),
+                                    dtype=np.intp).reshape(-1, 1)
+        offset_points = self.joints[:, [offset[:2] for offset in self.offsets.values()]].reshape(-1, 2)
+        self.offset_coordinates = offset_points * 4 + self.offset_axes
+        self.offset_absolute = np.array([offset[3] for offset in self.offsets.values()] * len(self.sides),
+                                        dtype=bool)
+        self.difference_values = np.array([[self.value_index(angle, side) for side in range(len(self.sides))]
+                                           for angle in self.differences.values()], dtype=np.intp).reshape(-1, 2)
+
+        # Rules are ordered the way the first failing one is picked: rule by
+        # rule over the sides, or the whole body rules then each side's rules
+        rules = [(self.compile_condition(condition), violation) for condition, violation in rules]
+        body_rules = [rule for rule in rules if not self.per_side_condition(rule[0])]
+        side_rules = [rule for rule in rules if self.per_side_condition(rule[0])]
+        side_indices = list(range(len(self.sides)))
+        if rule_first:
+            order = [(rule, side) for rule in rules
+                     for side in (side_indices if self.per_side_condition(rule[0]) else [None])]
+        else:
+            order = [(rule, None) for rule in body_rules] + [(rule, side) for side in side_indices
+                                                             for rule in side_rules]
+        if side_violations is not None and (body_rules or len(self.sides) != 2):
+            raise ValueError("Side violations need two sides and no whole body rules")
+
+        self.test_values, tests, self.condition_starts = [], [], []
+        self.rule_values, self.rule_violations, self.rule_sides = [], [], []
+        for (condition, violation), side in order:
+            self.add_tests(condition, side, tests)
+            self.rule_values.append({self.value_index(value, side) for value, *test in condition})
+            self.rule_violations.append(violation)
+            self.rule_sides.append(side)
+        for violation in set(self.rule_violations) - {None}:
+            if side_violations is None:
+                names = [violation]
+            else:
+                names = [f'{side}_{violation}' for side in self.sides] + [f'both_{side_violations[violation]}']
+            for name in names:
+                if name not in self.instructions:
+                    raise ValueError(f"No instruction for violation: {name}")
+        # Rules that block a gated side, the whole body ones and those up to the side
+        self.gate_rules = [[rule for rule, rule_side in enumerate(self.rule_sides)
+                            if rule_side is None or rule_side <= side] for side in side_indices]
+
+        # The phase conditions of every side follow the rules, the start
+        # conditions then the count ones
+        if not self.hold:
+            (self.start_stage, start), (self.count_stage, count) = phases
+            for condition in (self.compile_condition(start), self.compile_condition(count)):
+                for side in side_indices:
+                    self.add_tests(condition, side, tests)
+        if not tests:
+            raise ValueError("A spec needs phases or rules")
+        self.test_values = np.array(self.test_values, dtype=np.intp)
+        # Conditions of one test each are read from the comparison directly
+        self.compound = len(self.condition_starts) != len(tests)
+        self.condition_starts = np.array(self.condition_starts, dtype=np.intp)
+        self.test_signs, self.test_thresholds = compile_tests(tests)
+
+    @staticmethod
+    def compile_condition(condition):
+        """
+        List of the tests of a condition given as one test or a list of them
+        """
+        return list(condition) if isinstance(condition, list) else [condition]
+
+    def per_side_condition(self, condition):
+        """
+        Whether a condition tests an angle or offset, checked on every side
+        """
+        return any(value in self.angles or value in self.offsets for value, *test in condition)
+
+    def add_tests(self, condition, side, tests):
+        """
+        Add the tests of a condition on a side to the compiled tests, the
+        tests of each condition follow each other
+        """
+        self.condition_starts.append(len(tests))
+        for value, operator, threshold in condition:
+            self.test_values.append(self.value_index(value, side))
+            tests.append((operator, threshold))
+
+    def value_index(self, value, side=None):
+        """
+        Position of a value in the array of values computed for a frame
+
+        Args:
+            value: Angle, offset, lean or difference name
+            side: Index of the side, needed for angles and offsets
+        """
+        angles = len(self.leans) + len(self.sides) * len(self.angles)
+        offsets = angles + len(self.sides) * len(self.offsets)
+        if value in self.leans:
+            return list(self.leans).index(value)
+        if value in self.differences:
+            return offsets + list(self.differences).index(value)
+        if value not in self.angles and value not in self.offsets:
+            raise ValueError(f"Unknown value: {value}")
+        if side is None:
+            raise ValueError(f"{value} is measured on each side, a side is needed")
+        if value in self.angles:
+            return len(self.leans) + side * len(self.angles) + list(self.angles).index(value)
+        return angles + side * len(self.offsets) + list(self.offsets).index(value)
+
+
+class SpecTracker(VoiceTracker):
+    """
+    Tracker applying the ExerciseSpec set as `spec` by a subclass
+
+    Subclasses can extend draw() with overlay the spec does not describe.
+    """
+    spec = None
+
+    def __init__(self, sound=None):
+        super().__init__(sound)
+        spec = self.spec
+        self.instructions = spec.instructions
+        self.voice_prefix = spec.voice_prefix
+        if spec.hold:
+            self.counters = {}
+            self.stages = {None: None}
+        elif spec.per_side:
+            self.counters = {f'{side}_counter': 0 for side in spec.sides}
+            self.stages = {side: spec.initial_stage for side in spec.sides}
+        else:
+            self.counters = {'counter': 0}
+            self.stages = {None: spec.initial_stage}
+        self.hold_start = None  # Tick count the current hold started at
+        self.duration = 0  # Seconds of the last hold
+        self.sound_playing = False
+        self.failed = []  # Whether each rule of the spec failed in the last frame
+        self.offset_scale = (None, None)  # Frame size and the pixel scale of each offset
+
+    def counter_text(self, side=None):
+        """
+        Counter label of a side, or of the shared counter
+        """
+        if side is None:
+            return self.spec.counter_text.format(count=self.counters['counter'])
+        return self.spec.counter_text.format(side=side.title(), count=self.counters[f'{side}_counter'])
+
+    def rule_failed(self, value, side=None):
+        """
+        Whether a value broke a form rule in the last frame
+
+        Args:
+            value: Angle, offset, lean or difference name
+            side: Side name, needed for angles and offsets
+        """
+        spec = self.spec
+        index = spec.value_index(value, None if side is None else spec.sides.index(side))
+        return any(rule_failed and index in values for values, rule_failed in zip(spec.rule_values, self.failed))
+
+    def measure(self, landmarks):
+        """
+        Every value of the frame: leans, angles, offsets then differences
+        """
+        spec = self.spec
+        leans = len(spec.leans)
+
+        # Every angle in one call
+        if leans or spec.vertical_rows:
+            joints = np.empty((leans + len(spec.angle_joints), 3, 2), dtype=np.float32)
+            if leans:
+                lean_points = landmarks[spec.lean_points, :2].mean(axis=1)
+                joints[:leans, 0] = lean_points[:leans] - VERTICAL
+                joints[:leans, 1:] = lean_points.reshape(2, leans, 2).swapaxes(0, 1)
+            joints[leans:] = landmarks[spec.angle_joints, :2]
+            if spec.vertical_rows:
+                joints[spec.vertical_rows, 0] = joints[spec.vertical_rows, 1] - VERTICAL
+        else:
+            joints = landmarks[spec.angle_joints, :2]
+        values = calculate_angles(joints)
+        if not (spec.offsets or spec.differences):
+            return values
+
+        # Offsets in pixels of the frame, then differences between the sides
+        parts = [values]
+        if spec.offsets:
+            if self.offset_scale[0] != self.frame_size:
+                self.offset_scale = (self.frame_size, np.array(self.frame_size, dtype=np.float64)[spec.offset_axes])
+            ends = landmarks.take(spec.offset_coordinates) * self.offset_scale[1]
+            offsets = ends[:, 1] - ends[:, 0]
+            parts.append(np.abs(offsets, out=offsets, where=spec.offset_absolute))
+        if spec.differences:
+            first, second = spec.difference_values.T
+            parts.append(np.abs(np.subtract(values[first], values[second], dtype=np.float64)))
+        return np.concatenate(parts)
+
+    def update(self, landmarks):
+        spec = self.spec
+        values = self.measure(landmarks)
+
+        # Every rule and phase test in one comparison, and every condition
+        # from its tests in one reduction. The few results are read faster
+        # as a list.
+        results = values[spec.test_values] * spec.test_signs > spec.test_thresholds
+        if spec.compound:
+            results = np.logical_and.reduceat(results, spec.condition_starts)
+        results = results.tolist()
+        rules = len(spec.rule_violations)
+        sides = len(spec.sides)
+        failed = results[:rules]
+        starts = results[rules:rules + sides]
+        counts = results[rules + sides:]
+
+        # Only the most visible side is applied
+        applied = range(len(spec.sides))
+        if spec.visible is not None:
+            visibility = landmarks[spec.visible, 3].tolist()
+            selected = len(visibility) - 1 - visibility[::-1].index(max(visibility))
+            applied = [selected]
+            failed = [rule_failed and spec.rule_sides[rule] in (None, selected)
+                      for rule, rule_failed in enumerate(failed)]
+
+        self.failed = failed
+        form_ok = True not in failed
+        violation = None
+        if not form_ok:
+            violation = next((spec.rule_violations[rule] for rule, rule_failed in enumerate(failed)
+                              if rule_failed and spec.rule_violations[rule]), None)
+            if violation and spec.side_violations is not None:
+                broken = {spec.rule_sides[rule] for rule, rule_failed in enumerate(failed) if rule_failed}
+                if len(broken) == len(spec.sides):
+                    violation = f'both_{spec.side_violations[violation]}'
+                else:
+                    violation = f'{spec.sides[broken.pop()]}_{violation}'
+
+        if spec.hold:
+            # Time the hold while the form is right, restart it when the form breaks
+            if form_ok:
+                if self.hold_start is None:
+                    self.hold_start = cv2.getTickCount()
+                self.duration = (cv2.getTickCount() - self.hold_start) / cv2.getTickFrequency()
+            else:
+                self.hold_start = None
+            self.stages[None] = "hold" if form_ok else None
+        elif spec.paired:
+            # The stage moves once every side is there
+            if False not in starts:
+                if not (spec.gate_start and not form_ok):
+                    self.stages[None] = spec.start_stage
+            elif False not in counts and self.stages[None] == spec.start_stage and not (spec.gated and not form_ok):
+                self.stages[None] = spec.count_stage
+                self.counters['counter'] += 1
+                print(self.counter_text())
+        else:
+            for index in applied:
+                side = spec.sides[index]
+                key = side if spec.per_side else None
+                blocked = (spec.gated and (spec.gate_start or counts[index]) and
+                           True in [failed[rule] for rule in spec.gate_rules[index]])
+                if blocked and spec.gate_start:
+                    continue
+                if starts[index]:
+                    self.stages[key] = spec.start_stage
+                elif counts[index] and self.stages[key] == spec.start_stage and not blocked:
+                    self.stages[key] = spec.count_stage
+                    self.counters[f'{side}_counter' if spec.per_side else 'counter'] += 1
+                    print(self.counter_text(key))
+
+        values = values.tolist()
+        leans = len(spec.leans)
+        angles = len(spec.angles)
+        summary = {'duration': self.duration} if spec.hold else dict(self.counters)
+        summary.update({
+            'stage': dict(self.stages) if spec.per_side else self.stages[None],
+            'form_ok': form_ok,
+            'violation': violation,
+            'feedback': spec.instructions[violation] if violation else "",
+            'sides': {
+                side: dict(zip(spec.angles, values[leans + index * angles:]))
+                for index, side in enumerate(spec.sides)
+            }
+        })
+        if spec.visible is not None:
+            summary['side'] = spec.sides[applied[0]]
+        summary.update(zip(spec.leans, values))
+        return summary
+
+    def load_audio(self):
+        if self.voice_prefix is not None:
+            super().load_audio()
+
+    def play_feedback(self, summary):
+        if self.voice_prefix is not None:
+            super().play_feedback(summary)
+        elif not summary['form_ok'] and not self.sound_playing:
+            # Alert sound while the form is wrong
+            self.sound.play()
+            self.sound_playing = True
+        elif summary['form_ok'] and self.sound_playing:
+            self.sound.stop()
+            self.sound_playing = False
+
+    def close(self):
+        if self.voice_prefix is not None:
+            super().close()
+        elif self.sound_playing:
+            self.sound.stop()
+            self.sound_playing = False
+
+    def draw(self, image, landmarks, summary):
+        spec = self.spec
+        size = (image.shape[1], image.shape[0])
+
+        for side, points in zip(spec.sides, to_pixels(landmarks[spec.joints], size)):
+            if summary.get('side', side) != side:
+                continue
+            for start, end in spec.bones:
+                cv2.line(image, points[start], points[end], (0, 255, 0), 2)
+            for point in points:
+                cv2.circle(image, point, 7, (0, 0, 255), -1)
+
+            # Angle labels at their vertex, in red when they break a form rule
+            for angle, angle_joints in spec.angles.items():
+                if angle in spec.labels:
+                    color = (0, 0, 255) if self.rule_failed(angle, side) else (255, 255, 255)
+                    cv2.putText(image, spec.labels[angle].format(int(summary['sides'][side][angle])),
+                                points[angle_joints[1]], cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2, cv2.LINE_AA)
+
+        # Lean lines from top to base, in red when they break a form rule
+        if spec.leans:
+            lean_points = to_pixels(landmarks[spec.lean_points].mean(axis=1), size)
+            leans = len(spec.leans)
+            for lean_name, base, top in zip(spec.leans, lean_points[:leans], lean_points[leans:]):
+                color = (0, 0, 255) if self.rule_failed(lean_name) else (0, 255, 0)
+                cv2.line(image, top, base, color, 2)
+
+        # Feedback message while the form is wrong
+        if not summary['form_ok'] and summary['feedback']:
+            text = summary['feedback']
+            text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, spec.feedback_scale, 2)[0]
+            text_x = (image.shape[1] - text_size[0]) // 2
+            text_y = image.shape[0] // 2
+
+            # Draw semi-transparent background for text
+            shade_rectangle(image,
+                            (text_x - 10, text_y - text_size[1] - 10),
+                            (text_x + text_size[0] + 10, text_y + 10),
+                            0.5)
+            cv2.putText(image, text, (text_x, text_y),
+                        cv2.FONT_HERSHEY_SIMPLEX, spec.feedback_scale, (0, 0, 255), 2, cv2.LINE_AA)
+
+        # Counters, then the form indicator below them
+        keys = [] if spec.hold else spec.sides if spec.per_side else [None]
+        for row, key in enumerate(keys):
+            cv2.putText(image, self.counter_text(key), (10, 50 * (row + 1)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2, cv2.LINE_AA)
+        if spec.show_form_status:
+            form_status = "GOOD FORM" if summary['form_ok'] else "FIX YOUR FORM"
+            form_color = (0, 255, 0) if summary['form_ok'] else (0, 0, 255)  # Green if good, red if needs fixing
+            cv2.putText(image, form_status, (10, 50 * (len(keys) + 1)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, form_color, 2, cv2.LINE_AA)
+
+        # Exercise guidance at the bottom of the screen
+        for row, text in enumerate(spec.guidance):
+            cv2.putText(image, text, (10, image.shape[0] - 30 * (len(spec.guidance) - row)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1, cv2.LINE_AA)
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class FrameArena:
+    """
+    Reusable image buffers for one stream
+
+    OpenCV functions allocate a new full resolution image for every call
+    unless they are given a destination array. A stream keeps one arena and
+    passes its buffers as `dst=` so each frame is written into the same
+    memory. A buffer is only reallocated when the frame size changes.
+    """
+
+    def __init__(self):
+        self.allocations = 0
+        self._buffers = {}
+
+    def get(self, name, shape, dtype=np.uint8):
+        """
+        Get the buffer with a given name, allocating it if needed
+
+        Args:
+            name: Name of the buffer within the stream (e.g. "image", "rgb")
+            shape: Required array shape
+            dtype: Required array type
+
+        Returns:
+            Numpy array of that shape and type, with undefined contents
+        """
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+        return buffer
+
+    def stats(self):
+        """
+        Arena counters for monitoring
+
+        Returns:
+            Dictionary with the number of buffers, their total size in bytes
+            and how many allocations were made
+        """
+        return {
+            'buffers': len(self._buffers),
+            'bytes': sum(buffer.nbytes for buffer in self._buffers.values()),
+            'allocations': self.allocations
+        }
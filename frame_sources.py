@@ -0,0 +1,602 @@
+import os
+import time
+import threading
+from collections import deque
+import cv2
+import numpy as np
+
+# PyAV is optional, without it recorded videos are decoded by OpenCV
+try:
+    import av
+except ImportError:
+    av = None
+
+
+class FrameSource:
+    """
+    Base class for everything the exercise trackers can read frames from.
+
+    Sources expose the same isOpened() / read() / release() calls the trackers
+    already use on cv2.VideoCapture, so a raw VideoCapture can still be passed
+    in wherever a FrameSource is expected.
+    """
+    # Live sources deliver frames in real time (cameras, browser pushes).
+    # Recorded sources can be replayed as fast as the CPU allows.
+    live = False
+
+    # When the next frame is due, for sources replayed at a fixed rate
+    _next_frame_time = None
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def read(self):
+        """
+        Read the next frame
+
+        Returns:
+            Tuple (ret, frame) like cv2.VideoCapture.read()
+        """
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+    def _wait_for_next_frame(self, fps):
+        """
+        Sleep until the next frame is due when replaying at a fixed rate
+        """
+        now = time.perf_counter()
+        if self._next_frame_time is None:
+            self._next_frame_time = now
+        delay = self._next_frame_time - now
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_time += 1.0 / fps
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.release()
+
+
+class CameraSource(FrameSource):
+    """
+    Local camera read through cv2.VideoCapture
+    """
+    live = True
+
+    def __init__(self, index=0, width=None, height=None, fps=None):
+        self.index = index
+        self.cap = cv2.VideoCapture(index)
+
+        # Only override the driver defaults when asked to
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps:
+            self.cap.set(cv2.CAP_PROP_FPS, fps)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """
+    Recorded video file read through cv2.VideoCapture
+
+    By default frames are returned as fast as they can be decoded, which is
+    what benchmarks and batch analysis want. Pass realtime=True to pace the
+    replay at the file's own frame rate instead.
+    """
+
+    def __init__(self, path, loop=False, realtime=False):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Video file not found: {path}")
+
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.cap = cv2.VideoCapture(path)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.frame_index = 0
+        self._next_frame_time = None
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read(self):
+        ret, frame = self.cap.read()
+
+        # Rewind to the first frame when looping a recording
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.frame_index = 0
+            ret, frame = self.cap.read()
+
+        if ret:
+            self.frame_index += 1
+            if self.realtime:
+                self._wait_for_next_frame(self.fps)
+
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVSource(FrameSource):
+    """
+    Recorded video or stream decoded with PyAV (FFmpeg)
+
+    FFmpeg decodes on several threads and can scale frames while converting
+    them to BGR, so long recordings are decoded much faster than with
+    cv2.VideoCapture. Seeking is frame accurate: the demuxer jumps to the
+    keyframe before the target and the frames in between are decoded and
+    skipped.
+
+    Args:
+        path: Video file path or stream URL
+        loop: Restart from the first frame at the end of the video
+        realtime: Pace the replay at the video's own frame rate
+        width: Output width in pixels (None to keep the source size)
+        height: Output height in pixels (None to keep the aspect ratio)
+        threads: Decoder threads (0 lets FFmpeg pick one per core)
+        start_frame: Frame index to start decoding from
+    """
+
+    def __init__(self, path, loop=False, realtime=False, width=None, height=None,
+                 threads=0, start_frame=0):
+        if av is None:
+            raise ImportError("PyAV is not installed, run `pip install av`")
+        if '://' not in path and not os.path.exists(path):
+            raise FileNotFoundError(f"Video file not found: {path}")
+
+        self.path = path
+        self.loop = loop
+        self.realtime = realtime
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+
+        # Frame threading decodes several frames at once, slice threading
+        # splits each frame, AUTO lets FFmpeg use whichever the codec supports
+        self.stream.thread_type = 'AUTO'
+        self.stream.codec_context.thread_count = threads
+
+        rate = self.stream.average_rate or self.stream.guessed_rate
+        self.fps = float(rate) if rate else 30.0
+        self.frame_count = self.stream.frames or int(
+            float(self.stream.duration * self.stream.time_base) * self.fps
+            if self.stream.duration else 0
+        )
+
+        # Output size, keeping the aspect ratio when only the width is given
+        source_width = self.stream.codec_context.width
+        source_height = self.stream.codec_context.height
+        if width and not height:
+            height = int(round(width * source_height / source_width / 2)) * 2
+        elif height and not width:
+            width = int(round(height * source_width / source_height / 2)) * 2
+        self.width = width or source_width
+        self.height = height or source_height
+
+        self.frame_index = 0
+        self._opened = True
+        self._pending = None
+        self._next_frame_time = None
+        self._frames = self.container.decode(self.stream)
+        if start_frame:
+            self.seek(start_frame)
+
+    def seek(self, frame_index):
+        """
+        Move to a frame so the next read() returns exactly that frame
+
+        Args:
+            frame_index: Zero based index of the frame
+        """
+        target_time = frame_index / self.fps
+        start_time = float(self.stream.start_time * self.stream.time_base) if self.stream.start_time else 0.0
+        offset = int((start_time + target_time) / self.stream.time_base)
+
+        # Jump to the keyframe at or before the target
+        self.container.seek(offset, stream=self.stream, backward=True, any_frame=False)
+        self._frames = self.container.decode(self.stream)
+        self._pending = None
+
+        # Decode forward to the target, half a frame of tolerance for rounding
+        for frame in self._frames:
+            if frame.time is None or frame.time - start_time >= target_time - 0.5 / self.fps:
+                self._pending = frame
+                break
+
+        self.frame_index = frame_index
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def _next_frame(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return frame
+        return next(self._frames, None)
+
+    def read(self):
+        if not self._opened:
+            return False, None
+
+        try:
+            frame = self._next_frame()
+
+            # Rewind to the first frame when looping a recording
+            if frame is None and self.loop:
+                self.seek(0)
+                frame = self._next_frame()
+        except av.error.FFmpegError as e:
+            print(f"Error decoding {self.path}: {e}")
+            frame = None
+
+        if frame is None:
+            # Behave like an exhausted VideoCapture
+            self._opened = False
+            return False, None
+
+        if self.realtime:
+            self._wait_for_next_frame(self.fps)
+
+        self.frame_index += 1
+        image = frame.reformat(width=self.width, height=self.height, format='bgr24').to_ndarray()
+        return True, image
+
+    def release(self):
+        self._opened = False
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+class MemorySource(FrameSource):
+    """
+    Frames held in memory (a list of BGR images or any iterable of them)
+    """
+
+    def __init__(self, frames, loop=False):
+        self.frames = frames if loop else None
+        self.loop = loop
+        self._iterator = iter(frames)
+        self._opened = True
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened:
+            return False, None
+
+        try:
+            return True, next(self._iterator)
+        except StopIteration:
+            if self.loop and self.frames:
+                self._iterator = iter(self.frames)
+                return True, next(self._iterator)
+
+        # Behave like an exhausted VideoCapture
+        self._opened = False
+        return False, None
+
+    def release(self):
+        self._opened = False
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames with a moving shape, for load tests without a camera
+
+    Args:
+        width: Frame width in pixels
+        height: Frame height in pixels
+        num_frames: Number of frames before the source ends (None for endless)
+        fps: Pace frames at this rate (None to return them immediately)
+    """
+
+    def __init__(self, width=640, height=480, num_frames=None, fps=None):
+        self.width = width
+        self.height = height
+        self.num_frames = num_frames
+        self.fps = fps
+        self.frame_index = 0
+        self._opened = True
+        self._next_frame_time = None
+
+        # Static background, copied for every frame
+        gradient = np.linspace(0, 255, width, dtype=np.uint8)
+        self._background = np.dstack([np.tile(gradient, (height, 1))] * 3)
+
+    def isOpened(self):
+        return self._opened
+
+    def read(self):
+        if not self._opened:
+            return False, None
+        if self.num_frames is not None and self.frame_index >= self.num_frames:
+            self._opened = False
+            return False, None
+
+        if self.fps:
+            self._wait_for_next_frame(self.fps)
+
+        frame = self._background.copy()
+
+        # Bounce a filled circle across the frame so consecutive frames differ
+        period = 2 * max(self.width - 100, 1)
+        offset = (self.frame_index * 8) % period
+        x = 50 + (offset if offset < period // 2 else period - offset)
+        y = self.height // 2
+        cv2.circle(frame, (int(x), y), 40, (0, 0, 255), -1)
+        cv2.putText(frame, f'Frame {self.frame_index}', (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2, cv2.LINE_AA)
+
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        self._opened = False
+
+
+class LatestFrameSource(FrameSource):
+    """
+    Reads another source on a background thread and keeps only the newest frame
+
+    The tracker loop always gets the most recent frame instead of whatever has
+    queued up in the driver buffer, so latency stays bounded by one inference
+    time when inference is slower than the camera. Frames that were replaced
+    before the tracker read them are counted in `dropped`.
+
+    Args:
+        source: Source to read from (camera, stream, ...)
+        timeout: Seconds read() waits for a new frame before giving up
+    """
+    live = True
+
+    def __init__(self, source, timeout=2.0):
+        self.source = source
+        self.timeout = timeout
+        self.captured = 0
+        self.dropped = 0
+        self._frame = None
+        self._frame_id = 0
+        self._read_id = 0
+        self._ended = False
+        self._stopped = False
+        self._condition = threading.Condition()
+
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def _capture_loop(self):
+        try:
+            while not self._stopped and self.source.isOpened():
+                ret, frame = self.source.read()
+                if not ret:
+                    break
+
+                with self._condition:
+                    # The previous frame was never picked up by the tracker
+                    if self._frame_id > self._read_id:
+                        self.dropped += 1
+                    self._frame = frame
+                    self._frame_id += 1
+                    self.captured += 1
+                    self._condition.notify_all()
+        except Exception as e:
+            print(f"Error in capture thread: {e}")
+        finally:
+            with self._condition:
+                self._ended = True
+                stopped = self._stopped
+                self._condition.notify_all()
+            # release() left the source to this thread, which may have been
+            # inside source.read() when it was called
+            if stopped:
+                self.source.release()
+
+    def isOpened(self):
+        with self._condition:
+            # Still open while the thread runs or an unread frame is waiting
+            return not self._ended or self._frame_id > self._read_id
+
+    def read(self):
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._frame_id > self._read_id or self._ended,
+                timeout=self.timeout
+            )
+            if self._frame_id == self._read_id:
+                return False, None
+
+            self._read_id = self._frame_id
+            return True, self._frame
+
+    def stats(self):
+        """
+        Capture counters for monitoring
+
+        Returns:
+            Dictionary with captured and dropped frame counts
+        """
+        with self._condition:
+            return {'captured': self.captured, 'dropped': self.dropped}
+
+    def release(self):
+        with self._condition:
+            self._stopped = True
+            ended = self._ended
+        if ended:
+            self.source.release()
+        else:
+            # VideoCapture is not thread safe, the capture thread releases
+            # the source once its current read() returns
+            self._thread.join(timeout=1.0)
+
+
+class PushedFrameSource(FrameSource):
+    """
+    Frames pushed in from outside, for example JPEGs sent by a browser
+
+    Pushed frames wait in a small bounded queue. When the tracker falls behind,
+    the oldest queued frame is dropped to make room, so slow inference sheds
+    frames instead of building up memory and latency. Frames are kept encoded
+    until read(), so dropped frames are never decoded.
+
+    Args:
+        max_queued: Number of frames kept waiting for the tracker
+        timeout: Seconds read() waits for a frame before ending the stream
+    """
+    live = True
+
+    def __init__(self, max_queued=2, timeout=10.0):
+        self.timeout = timeout
+        self.received = 0
+        self.dropped = 0
+        self._queue = deque(maxlen=max_queued)
+        self._closed = False
+        self._condition = threading.Condition()
+
+    def push(self, data):
+        """
+        Queue a frame
+
+        Args:
+            data: JPEG/PNG bytes or an already decoded BGR image
+        """
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(data)
+            self.received += 1
+            self._condition.notify()
+
+    def isOpened(self):
+        with self._condition:
+            return not self._closed or len(self._queue) > 0
+
+    def read(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._queue or self._closed,
+                                         timeout=max(0.0, deadline - time.monotonic()))
+                if not self._queue:
+                    return False, None
+                data = self._queue.popleft()
+
+            # Decode outside the lock so pushes are never blocked by it
+            if isinstance(data, np.ndarray):
+                return True, data
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                return True, frame
+            # Skip frames that do not decode, until the timeout
+            print("Could not decode pushed frame")
+
+    def stats(self):
+        """
+        Ingestion counters for monitoring
+
+        Returns:
+            Dictionary with received, dropped and queued frame counts
+        """
+        with self._condition:
+            return {'received': self.received, 'dropped': self.dropped, 'queued': len(self._queue)}
+
+    def release(self):
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+
+def open_video(path, decoder='auto', **kwargs):
+    """
+    Open a recorded video with the fastest available decoder
+
+    Args:
+        path: Video file path or stream URL
+        decoder: "pyav", "opencv" or "auto" (PyAV when installed)
+        **kwargs: Options for the source, e.g. loop and realtime. Options only
+            PyAV supports (width, height, threads, start_frame) are ignored
+            by the OpenCV decoder.
+
+    Returns:
+        PyAVSource or VideoFileSource
+    """
+    if decoder == 'pyav' or (decoder == 'auto' and av is not None):
+        return PyAVSource(path, **kwargs)
+    if decoder not in ('auto', 'opencv'):
+        raise ValueError(f"Unknown decoder: {decoder}")
+
+    return VideoFileSource(path, loop=kwargs.get('loop', False), realtime=kwargs.get('realtime', False))
+
+
+def open_source(source=None):
+    """
+    Turn a source description into a FrameSource
+
+    Args:
+        source: None for the default camera, a camera index, "synthetic",
+            a path to a video file, or an already opened source
+
+    Returns:
+        Object with isOpened() / read() / release()
+    """
+    # Cameras are read on their own thread so stale frames never queue up
+    if source is None:
+        return LatestFrameSource(CameraSource(0))
+
+    # Already a source (FrameSource or a raw cv2.VideoCapture)
+    if hasattr(source, 'read') and hasattr(source, 'isOpened'):
+        return source
+
+    if isinstance(source, int):
+        return LatestFrameSource(CameraSource(source))
+
+    if isinstance(source, str):
+        if source.isdigit():
+            return LatestFrameSource(CameraSource(int(source)))
+        if source == 'synthetic':
+            return SyntheticSource()
+        return open_video(source)
+
+    raise ValueError(f"Unsupported frame source: {source!r}")
+
+
+def frame_timestamp(source):
+    """
+    Timestamp of the frame a source returned last
+
+    Recordings are timed by their frame index and rate, so replays that run
+    slower or faster than real time keep the recorded timing. Live sources
+    are timed by the clock.
+
+    Args:
+        source: Source the frame was read from
+
+    Returns:
+        Seconds, comparable between frames of the same source
+    """
+    fps = getattr(source, 'fps', None)
+    if not getattr(source, 'live', False) and fps and hasattr(source, 'frame_index'):
+        return source.frame_index / fps
+    return time.perf_counter()
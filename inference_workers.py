@@ -0,0 +1,389 @@
+import os
+import time
+import uuid
+import queue
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+
+# Inference processes import this module, so it must not import utils at
+# module level (utils builds a Pose graph at import time)
+
+
+def _worker_main(requests, responses, pose_options):
+    """
+    Inference process loop: one Pose graph per stream, fed from shared memory
+    """
+    import mediapipe as mp
+
+    graphs = {}  # Stream id -> Pose graph
+    memories = {}  # Shared memory name -> attached block
+
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+
+        if message[0] == 'close':
+            _, session_id, names = message
+            graph = graphs.pop(session_id, None)
+            if graph is not None:
+                graph.close()
+            for name in names:
+                memory = memories.pop(name, None)
+                if memory is not None:
+                    memory.close()
+            continue
+
+        _, request_id, session_id, name, offset, shape, model_complexity = message
+        try:
+            if name not in memories:
+                # Spawned processes share the parent's resource tracker, which
+                # already knows the block, the stream unlinks it when it ends
+                memories[name] = shared_memory.SharedMemory(name=name)
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=memories[name].buf, offset=offset)
+
+            if session_id not in graphs:
+                options = pose_options
+                if model_complexity is not None:
+                    options = dict(pose_options, model_complexity=model_complexity)
+                graphs[session_id] = mp.solutions.pose.Pose(**options)
+            results = graphs[session_id].process(frame)
+            del frame
+
+            landmarks = None
+            if results.pose_landmarks:
+                landmarks = np.array(
+                    [[point.x, point.y, point.z, point.visibility]
+                     for point in results.pose_landmarks.landmark],
+                    dtype=np.float32
+                )
+            responses.put((request_id, landmarks, None))
+        except Exception as e:
+            responses.put((request_id, None, f"{type(e).__name__}: {e}"))
+
+
+class InferenceWorker:
+    """
+    One inference process with its request and response queues
+
+    A dispatcher thread hands responses to the waiting streams and restarts
+    the process if it dies; requests that were in flight fail, and the
+    streams carry on with their next frame on the new process.
+    """
+
+    def __init__(self, context, pose_options, index):
+        self.index = index
+        self.sessions = 0
+        self.requests_sent = 0
+        self.restarts = 0
+        self.round_trip = 0.0
+        self._context = context
+        self._pose_options = pose_options
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._running = True
+        self._start_process()
+
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def _start_process(self):
+        self.requests = self._context.Queue()
+        self.responses = self._context.Queue()
+        self.process = self._context.Process(
+            target=_worker_main,
+            args=(self.requests, self.responses, self._pose_options),
+            name=f"pose-worker-{self.index}",
+            daemon=True
+        )
+        self.process.start()
+
+    def submit(self, session_id, name, offset, shape, model_complexity=None):
+        """
+        Ask the process to run detection on a frame in shared memory
+
+        Returns:
+            Future resolving to a 33x4 landmark array or None
+        """
+        future = Future()
+        future.sent = time.perf_counter()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            self.requests_sent += 1
+            requests = self.requests
+        requests.put(('process', request_id, session_id, name, offset, shape, model_complexity))
+        return future
+
+    def close_session(self, session_id, names):
+        """
+        Drop a stream's graph and shared memory in the process
+        """
+        with self._lock:
+            self.sessions -= 1
+            requests = self.requests
+        requests.put(('close', session_id, names))
+
+    def _dispatch(self):
+        while self._running:
+            try:
+                request_id, landmarks, error = self.responses.get(timeout=0.5)
+            except queue.Empty:
+                if self._running and not self.process.is_alive():
+                    self._restart()
+                continue
+            except (EOFError, OSError):
+                if self._running:
+                    self._restart()
+                continue
+
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            elapsed = time.perf_counter() - future.sent
+            self.round_trip = elapsed if self.round_trip == 0.0 else self.round_trip + 0.1 * (elapsed - self.round_trip)
+            if error:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(landmarks)
+
+    def _restart(self):
+        print(f"Inference worker {self.index} exited with code {self.process.exitcode}, restarting")
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self.restarts += 1
+            self._start_process()
+        for future in pending.values():
+            future.set_exception(RuntimeError("Inference worker crashed"))
+
+    def stop(self):
+        self._running = False
+        try:
+            self.requests.put(None)
+        except Exception:
+            pass
+        self.process.join(timeout=2.0)
+        if self.process.is_alive():
+            self.process.terminate()
+
+
+class RemotePose:
+    """
+    A stream's handle on an inference process, used like a Pose graph
+
+    Frames go through a ring of shared memory slots owned by the stream.
+    Rotating slots means a frame whose request timed out can still be read
+    by the worker while the next frame is written to a different slot.
+
+    Args:
+        worker: InferenceWorker serving this stream
+        ring_size: Number of frame slots
+        timeout: Seconds to wait for a detection result
+        model_complexity: Model complexity of the stream's graph (None for
+            the pool's options)
+    """
+
+    def __init__(self, worker, ring_size=2, timeout=5.0, model_complexity=None):
+        self.session_id = uuid.uuid4().hex
+        self.worker = worker
+        self.model_complexity = model_complexity
+        self.ring_size = ring_size
+        self.timeout = timeout
+        self.failures = 0
+        self._memory = None
+        self._slot_size = 0
+        self._slot = 0
+        self._names = []
+
+    def _ensure_memory(self, nbytes):
+        if self._memory is not None and nbytes <= self._slot_size:
+            return
+        # Frame size grew, switch to a larger block (the old one is released
+        # when the stream closes, the worker may still have it attached)
+        self._memory = shared_memory.SharedMemory(create=True, size=nbytes * self.ring_size)
+        self._slot_size = nbytes
+        self._names.append(self._memory)
+
+    def submit(self, image):
+        """
+        Send an RGB image to the inference process without waiting
+
+        Args:
+            image: RGB image (uint8), copied before this returns
+
+        Returns:
+            Future to pass to collect()
+        """
+        self._ensure_memory(image.nbytes)
+        offset = self._slot * self._slot_size
+        self._slot = (self._slot + 1) % self.ring_size
+
+        slot = np.ndarray(image.shape, dtype=np.uint8, buffer=self._memory.buf, offset=offset)
+        np.copyto(slot, image)
+        del slot
+
+        return self.worker.submit(self.session_id, self._memory.name, offset, image.shape,
+                                  self.model_complexity)
+
+    def collect(self, future):
+        """
+        Wait for the result of submit()
+
+        Returns:
+            PoseResults, with no landmarks if detection failed
+        """
+        from utils import PoseResults
+        try:
+            landmarks = future.result(timeout=self.timeout)
+            return PoseResults(landmarks)
+        except Exception as e:
+            self.failures += 1
+            print(f"Remote pose detection failed: {e}")
+            return PoseResults(None)
+
+    def process(self, image):
+        """
+        Run pose detection on an RGB image in the inference process
+
+        Args:
+            image: RGB image (uint8)
+
+        Returns:
+            PoseResults, with no landmarks if detection failed
+        """
+        return self.collect(self.submit(image))
+
+    def close(self):
+        self.worker.close_session(self.session_id, [memory.name for memory in self._names])
+        for memory in self._names:
+            memory.close()
+            memory.unlink()
+        self._names = []
+        self._memory = None
+
+
+class ProcessPosePool:
+    """
+    Pool of inference processes, used in place of PosePool
+
+    Pose detection runs outside the web worker's GIL, so one worker can keep
+    every core busy, and a crash in MediaPipe takes down one inference
+    process (which is restarted) instead of the HTTP worker. Frames are
+    written to shared memory and only a small message naming the slot
+    crosses the process boundary; landmarks come back as a 33x4 float32
+    array, images are never pickled.
+
+    Each stream is assigned to the process serving the fewest streams and
+    gets its own Pose graph inside it. Processes are started on first use.
+
+    Args:
+        processes: Number of inference processes (defaults to the core count)
+        ring_size: Shared memory frame slots per stream
+        timeout: Seconds a stream waits for a detection result
+        pose_options: Options for mp_pose.Pose (defaults to utils.POSE_OPTIONS)
+    """
+
+    def __init__(self, processes=None, ring_size=2, timeout=5.0, pose_options=None):
+        self.processes = processes or os.cpu_count() or 1
+        self.ring_size = ring_size
+        self.timeout = timeout
+        self.pose_options = pose_options
+        self.warmup_time = None
+        self._workers = []
+        self._lock = threading.Lock()
+
+    def _start(self):
+        if self.pose_options is None:
+            from utils import POSE_OPTIONS
+            self.pose_options = POSE_OPTIONS
+
+        # Fresh interpreters, forking would copy the web worker's threads and graphs
+        context = multiprocessing.get_context('spawn')
+        self._workers = [InferenceWorker(context, self.pose_options, index) for index in range(self.processes)]
+        print(f"Started {self.processes} inference processes")
+
+    def acquire(self, timeout=None, model_complexity=None):
+        """
+        Open a stream on the least busy inference process
+
+        Args:
+            timeout: Unused, streams never wait for a process
+            model_complexity: Model complexity of the stream's graph
+
+        Returns:
+            RemotePose handle for the stream
+        """
+        with self._lock:
+            if not self._workers:
+                self._start()
+            worker = min(self._workers, key=lambda w: w.sessions)
+            worker.sessions += 1
+        return RemotePose(worker, self.ring_size, self.timeout, model_complexity)
+
+    def warm(self, count=None, frames=3, model_complexity=None):
+        """
+        Start the inference processes and run frames through each of them
+
+        Args:
+            count: Unused, every process is warmed
+            frames: Synthetic frames run through each process
+            model_complexity: Model complexity of the warm-up graphs
+        """
+        frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        start = time.perf_counter()
+        # Streams go to the least busy process, so these land on one each
+        handles = [self.acquire(model_complexity=model_complexity) for _ in range(self.processes)]
+        try:
+            for handle in handles:
+                for _ in range(frames):
+                    handle.process(frame)
+        finally:
+            for handle in handles:
+                self.release(handle)
+        self.warmup_time = time.perf_counter() - start
+        print(f"Warmed up {self.processes} inference processes in {self.warmup_time:.2f}s")
+
+    def release(self, pose):
+        """
+        Close a stream opened with acquire()
+        """
+        pose.close()
+
+    def stats(self):
+        """
+        Pool counters for monitoring
+
+        Returns:
+            Dictionary with per process stream counts, requests, average
+            round trip time and restarts
+        """
+        with self._lock:
+            return {
+                'warmup_ms': round(self.warmup_time * 1000, 1) if self.warmup_time is not None else None,
+                'processes': [
+                    {
+                        'pid': worker.process.pid,
+                        'alive': worker.process.is_alive(),
+                        'sessions': worker.sessions,
+                        'requests': worker.requests_sent,
+                        'round_trip_ms': round(worker.round_trip * 1000, 1),
+                        'restarts': worker.restarts
+                    }
+                    for worker in self._workers
+                ]
+            }
+
+    def shutdown(self):
+        """
+        Stop all inference processes
+        """
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,166 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from utils import LandmarkList, landmark_array
+
+# Frame states in a cache file
+UNKNOWN, PERSON, NOBODY = 0, 1, 2
+
+
+class LandmarkCache:
+    """
+    Landmarks detected on recorded videos, kept on disk between replays
+
+    Re-running the same recordings to tune thresholds repeats the same
+    detections every time. Each video and detection configuration gets one
+    file holding the landmarks of every frame detected so far; replays read
+    them back and only run detection on frames the file does not have yet.
+
+    Files are keyed by a hash of the video's content, so renamed or copied
+    recordings still hit, and by a hash of the configuration (model
+    complexity, confidences, inference size, frame size, ...), so changing
+    any of them starts a new file.
+
+    Args:
+        directory: Directory holding the cache files
+    """
+
+    def __init__(self, directory='landmark_cache'):
+        self.directory = directory
+        self._hashes = {}  # (path, size, mtime) -> content hash
+        self._lock = threading.Lock()
+
+    def content_hash(self, path):
+        """
+        SHA-256 of a file's content, remembered while the file is unchanged
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+        with self._lock:
+            if key in self._hashes:
+                return self._hashes[key]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self._lock:
+            self._hashes[key] = digest.hexdigest()
+        return self._hashes[key]
+
+    def open(self, path, **config):
+        """
+        Open the cached landmarks of a video under a detection configuration
+
+        Args:
+            path: Video file path
+            **config: Detection settings the landmarks depend on (JSON
+                serializable values)
+
+        Returns:
+            CachedVideo for reading and adding frames
+        """
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+        name = f"{self.content_hash(path)[:16]}_{config_hash[:12]}.npz"
+        return CachedVideo(os.path.join(self.directory, name))
+
+
+class CachedVideo:
+    """
+    Cached landmarks of one video under one configuration
+
+    Args:
+        path: Cache file, loaded if it exists
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._changed = False
+        self.states = np.zeros(0, dtype=np.int8)
+        self.landmarks = np.zeros((0, 33, 4), dtype=np.float32)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                self.states = data['states']
+                self.landmarks = data['landmarks']
+
+    def lookup(self, index):
+        """
+        Get the landmarks of a frame if they are cached
+
+        Args:
+            index: Zero based frame index in the video
+
+        Returns:
+            Tuple (hit, landmarks), landmarks is None when nobody was found
+        """
+        if index >= len(self.states) or self.states[index] == UNKNOWN:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        if self.states[index] == NOBODY:
+            return True, None
+        return True, LandmarkList(self.landmarks[index])
+
+    def store(self, index, pose_landmarks):
+        """
+        Add the detection result of a frame
+
+        Args:
+            index: Zero based frame index in the video
+            pose_landmarks: Detected landmarks, or None when nobody was found
+        """
+        if index >= len(self.states):
+            size = max(index + 1, 2 * len(self.states))
+            self.states = np.concatenate([self.states, np.zeros(size - len(self.states), dtype=np.int8)])
+            self.landmarks = np.concatenate(
+                [self.landmarks, np.zeros((size - len(self.landmarks), 33, 4), dtype=np.float32)])
+
+        if pose_landmarks is None:
+            self.states[index] = NOBODY
+        else:
+            self.states[index] = PERSON
+            self.landmarks[index] = landmark_array(pose_landmarks)
+        self._changed = True
+
+    def save(self):
+        """
+        Write the new frames to disk, keeping frames another replay saved
+        """
+        if not self._changed:
+            return
+
+        if os.path.exists(self.path):
+            # Another replay of the same video may have saved frames since
+            with np.load(self.path) as data:
+                states, landmarks = data['states'], data['landmarks']
+            known = min(len(states), len(self.states))
+            missing = np.flatnonzero(self.states[:known] == UNKNOWN)
+            missing = missing[states[missing] != UNKNOWN]
+            self.states[missing] = states[missing]
+            self.landmarks[missing] = landmarks[missing]
+            if len(states) > len(self.states):
+                self.states = np.concatenate([self.states, states[len(self.states):]])
+                self.landmarks = np.concatenate([self.landmarks, landmarks[len(self.landmarks):]])
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp.npz"
+        np.savez_compressed(temp_path, states=self.states, landmarks=self.landmarks)
+        os.replace(temp_path, self.path)
+        self._changed = False
+
+    def stats(self):
+        """
+        Cache counters for monitoring
+
+        Returns:
+            Dictionary with hits, misses and the number of cached frames
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'cached_frames': int(np.count_nonzero(self.states))
+        }
@@ -0,0 +1,144 @@
+import time
+import cv2
+
+
+class MotionGate:
+    """
+    Decides whether a frame changed enough to be worth running pose detection on
+
+    Each frame is shrunk to a small grayscale thumbnail and compared with the
+    thumbnail of the last frame that went through pose detection. While the
+    share of changed pixels stays below the threshold (plank holds, rests
+    between sets) the previous landmarks can be reused. Comparing against the
+    last processed frame rather than the previous one means slow movement
+    still adds up and triggers detection, and a refresh is forced every
+    `refresh_interval` frames regardless.
+
+    Args:
+        threshold: Fraction of thumbnail pixels that must change to count as motion
+        pixel_threshold: Gray level difference for a pixel to count as changed,
+            high enough to ignore camera noise
+        refresh_interval: Run detection at least once every this many frames
+        size: Thumbnail size used for the comparison
+    """
+
+    def __init__(self, threshold=0.01, pixel_threshold=25, refresh_interval=10, size=(64, 48)):
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.refresh_interval = refresh_interval
+        self.size = size
+        self.processed = 0
+        self.skipped = 0
+        self.last_motion = 0.0
+        self._reference = None
+        self._since_refresh = 0
+
+    def should_process(self, frame):
+        """
+        Check a frame and record the decision
+
+        Args:
+            frame: BGR frame from the source
+
+        Returns:
+            True when pose detection should run on this frame
+        """
+        thumbnail = cv2.cvtColor(
+            cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA),
+            cv2.COLOR_BGR2GRAY
+        )
+
+        if self._reference is not None:
+            difference = cv2.absdiff(thumbnail, self._reference)
+            self.last_motion = cv2.countNonZero(
+                cv2.threshold(difference, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+            ) / difference.size
+
+            # Static frame and no refresh due yet, keep the previous landmarks
+            if self.last_motion < self.threshold and self._since_refresh + 1 < self.refresh_interval:
+                self._since_refresh += 1
+                self.skipped += 1
+                return False
+
+        self._reference = thumbnail
+        self._since_refresh = 0
+        self.processed += 1
+        return True
+
+    def reset(self):
+        """
+        Force detection on the next frame
+        """
+        self._reference = None
+
+    def stats(self):
+        """
+        Gate counters for monitoring
+
+        Returns:
+            Dictionary with processed and skipped frame counts
+        """
+        return {'processed': self.processed, 'skipped': self.skipped}
+
+
+class IdleMonitor:
+    """
+    Tracks whether an athlete is in view and throttles the stream when not
+
+    After `idle_after` seconds without detected landmarks the stream goes
+    idle: pose detection only runs `probe_fps` times per second and a cached
+    "waiting for athlete" frame is sent instead of freshly encoded video.
+    The first probe that finds a person switches back to full rate.
+
+    Args:
+        idle_after: Seconds without a person before going idle
+        probe_fps: Detection attempts per second while idle
+    """
+
+    def __init__(self, idle_after=3.0, probe_fps=2.0):
+        self.idle_after = idle_after
+        self.probe_interval = 1.0 / probe_fps
+        self.active = False
+        self.idle_periods = 0
+        self._last_seen = time.monotonic()
+
+    def update(self, person_found):
+        """
+        Record whether the latest detection found a person
+
+        Args:
+            person_found: True when landmarks were detected
+
+        Returns:
+            True while the stream is idle
+        """
+        now = time.monotonic()
+        if person_found:
+            self._last_seen = now
+            if self.active:
+                print("Athlete detected, resuming full frame rate")
+                self.active = False
+        elif not self.active and now - self._last_seen >= self.idle_after:
+            print(f"No athlete for {self.idle_after:g}s, probing at {1.0 / self.probe_interval:g} fps")
+            self.active = True
+            self.idle_periods += 1
+        return self.active
+
+
+def waiting_frame(image):
+    """
+    Build the frame shown while no athlete is in view
+
+    Args:
+        image: Last BGR frame from the camera, used as a dimmed background
+
+    Returns:
+        BGR image with the waiting message
+    """
+    frame = cv2.convertScaleAbs(image, alpha=0.3)
+    text = "Waiting for athlete..."
+    text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 1, 2)[0]
+    cv2.putText(frame, text,
+                ((frame.shape[1] - text_size[0]) // 2, frame.shape[0] // 2),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2, cv2.LINE_AA)
+    return frame
@@ -0,0 +1,235 @@
+import itertools
+import cv2
+import numpy as np
+from roi import RoiTracker
+from utils import landmark_array, shade_rectangle
+
+
+class PersonDetector:
+    """
+    Finds people with OpenCV's HOG people detector
+
+    Detection runs on a downscaled copy of the frame. The detector window is
+    64x128 pixels, so at the default scale people need to be at least 256
+    pixels tall in the frame, which suits a camera facing a class.
+
+    Args:
+        scale: Factor the frame is scaled by before detection
+        min_confidence: Lowest SVM score accepted as a person
+    """
+
+    def __init__(self, scale=0.5, min_confidence=0.3):
+        self.scale = scale
+        self.min_confidence = min_confidence
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, image):
+        """
+        Find the people in a BGR frame
+
+        Returns:
+            List of (left, top, right, bottom) boxes in pixels, largest first
+        """
+        small = cv2.resize(image, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        boxes = [
+            (x / self.scale, y / self.scale, (x + w) / self.scale, (y + h) / self.scale)
+            for (x, y, w, h), weight in zip(rects, np.ravel(weights))
+            if weight >= self.min_confidence
+        ]
+        return sorted(boxes, key=lambda box: (box[2] - box[0]) * (box[3] - box[1]), reverse=True)
+
+
+def box_overlap(a, b):
+    """
+    Intersection over union of two (left, top, right, bottom) boxes
+    """
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union
+
+
+class TrackedPerson:
+    """
+    One athlete of a group, with their own Pose graph, crop and rep state
+    """
+
+    def __init__(self, person_id, tracker, pose):
+        self.id = person_id
+        self.tracker = tracker
+        self.pose = pose
+        # The crop never widens to the full frame, that would find someone else
+        self.roi = RoiTracker(max_area=1.0)
+        self.landmarks = None
+        self.summary = None
+        self.missed = 0
+
+
+class GroupTracker:
+    """
+    Tracks several athletes in one camera view
+
+    A person detector runs every `detect_interval` frames (and whenever
+    nobody is tracked) to pick up new athletes. Between detections each
+    athlete is followed by running the landmark model on a crop around their
+    last landmarks, with their own Pose graph and their own exercise tracker,
+    so reps are counted per athlete. All crops of a frame are handed out
+    before any result is awaited, so graphs running in inference processes
+    work on them in parallel. At most `max_people` athletes are tracked,
+    which bounds the detection work per frame.
+
+    Args:
+        make_tracker: Callable returning a new ExerciseTracker
+        pool: Pool the Pose graphs are checked out of
+        max_people: Most athletes tracked at once
+        detect_interval: Frames between person detections
+        detector: Object with a detect(image) method returning person boxes
+            (defaults to PersonDetector)
+        max_missed: Frames an athlete may go undetected before being dropped
+    """
+
+    def __init__(self, make_tracker, pool, max_people=4, detect_interval=15, detector=None, max_missed=10):
+        self.make_tracker = make_tracker
+        self.pool = pool
+        self.max_people = max_people
+        self.detect_interval = detect_interval
+        self.detector = detector or PersonDetector()
+        self.max_missed = max_missed
+        self.people = []
+        self.frames = 0
+        self._last_detection = None
+        self._ids = itertools.count(1)
+
+    def _detect(self, image):
+        self._last_detection = self.frames
+        for box in self.detector.detect(image):
+            matched = next((person for person in self.people
+                            if person.roi.box and box_overlap(person.roi.box, box) > 0.3), None)
+            if matched is not None:
+                if matched.missed:
+                    # Lost by its own tracking, recentre on the detection
+                    last_box = matched.roi.box
+                    matched.roi.set_box(box, image.shape)
+                    matched.roi.box = matched.roi.box or last_box
+                continue
+            if len(self.people) >= self.max_people:
+                break
+            try:
+                pose = self.pool.acquire(timeout=0)
+            except TimeoutError:
+                break
+            person = TrackedPerson(next(self._ids), self.make_tracker(), pose)
+            person.roi.set_box(box, image.shape)
+            if person.roi.box is None:
+                self.pool.release(pose)
+                continue
+            self.people.append(person)
+            print(f"Tracking athlete {person.id}")
+
+    def update(self, image, arena):
+        """
+        Find and follow the athletes in a frame and apply the exercise rules
+
+        Args:
+            image: BGR frame
+            arena: FrameArena for the crop buffers
+
+        Returns:
+            List of TrackedPerson
+        """
+        if not self.people or self.frames - self._last_detection >= self.detect_interval:
+            self._detect(image)
+        self.frames += 1
+
+        pending = []
+        # Buffers are keyed by position rather than athlete id, so there are
+        # never more than max_people of them however many athletes come and go
+        for slot, person in enumerate(self.people):
+            region = person.roi.crop(image)
+            rgb = cv2.cvtColor(region, cv2.COLOR_BGR2RGB, dst=arena.get(f'rgb_{slot}', region.shape))
+            if hasattr(person.pose, 'submit'):
+                pending.append((person, person.pose.submit(rgb)))
+            else:
+                pending.append((person, person.pose.process(rgb)))
+
+        for person, result in pending:
+            if hasattr(person.pose, 'collect'):
+                result = person.pose.collect(result)
+            box = person.roi.box
+            person.landmarks = person.roi.update(result.pose_landmarks, image.shape)
+            # The crop never falls back to the full frame, keep the last good
+            # box when the athlete is lost or too occluded to place one
+            person.roi.box = person.roi.box or box
+            if person.landmarks is None:
+                person.missed += 1
+                continue
+            person.missed = 0
+            person.tracker.frame_size = (image.shape[1], image.shape[0])
+            person.summary = person.tracker.update(landmark_array(person.landmarks))
+
+        self._drop_lost()
+        return self.people
+
+    def _drop_lost(self):
+        kept = []
+        for person in self.people:
+            lost = person.missed > self.max_missed
+            # Two crops that converged on the same athlete, keep the older one
+            duplicate = person.roi.box is not None and any(
+                other.roi.box is not None and box_overlap(person.roi.box, other.roi.box) > 0.6 for other in kept)
+            if lost or duplicate:
+                self._release(person)
+                print(f"Stopped tracking athlete {person.id}")
+            else:
+                kept.append(person)
+        self.people = kept
+
+    def _release(self, person):
+        person.tracker.close()
+        self.pool.release(person.pose)
+
+    def close(self):
+        """
+        Give back every athlete's Pose graph
+        """
+        for person in self.people:
+            self._release(person)
+        self.people = []
+
+
+def rep_text(summary):
+    """
+    Short progress text for a tracker summary (reps, or seconds held)
+    """
+    if 'counter' in summary:
+        return f"{summary['counter']} reps"
+    if 'left_counter' in summary:
+        return f"L {summary['left_counter']} / R {summary['right_counter']}"
+    if 'duration' in summary:
+        return f"{int(summary['duration'])}s"
+    return ""
+
+
+def draw_person(image, person):
+    """
+    Draw an athlete's box, number and progress on the frame
+    """
+    if person.roi.box is None:
+        return
+    x0, y0, x1, y1 = person.roi.box
+    form_ok = person.summary is None or person.summary.get('form_ok', True)
+    color = (0, 255, 0) if form_ok else (0, 0, 255)
+    cv2.rectangle(image, (x0, y0), (x1, y1), color, 2)
+
+    label = f"#{person.id}"
+    if person.summary is not None:
+        label += f" {rep_text(person.summary)}"
+    text_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
+    shade_rectangle(image, (x0, max(0, y0 - text_size[1] - 10)), (x0 + text_size[0] + 10, y0), 0.5)
+    cv2.putText(image, label, (x0 + 5, max(text_size[1], y0 - 5)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2,
+                cv2.LINE_AA)
@@ -0,0 +1,92 @@
+import time
+
+
+class FramePacer:
+    """
+    Holds a stream to a target frame rate and measures the work per frame
+
+    Frames are paced against deadlines rather than fixed sleeps, so the time
+    spent on detection and encoding is subtracted from the wait and the
+    stream keeps its rate as long as the work fits in the budget
+    (1 / target_fps). When a frame overruns, the schedule restarts from now
+    instead of bursting frames to catch up.
+
+    Args:
+        target_fps: Frames per second to deliver (None or 0 for no pacing)
+    """
+
+    # Weight of the newest frame in the running averages
+    SMOOTHING = 0.1
+
+    def __init__(self, target_fps=None):
+        self.target_fps = target_fps or None
+        self.budget = 1.0 / self.target_fps if self.target_fps else None
+        self.frames = 0
+        self.over_budget = 0
+        self.work_time = 0.0  # Running average of seconds of work per frame
+        self.frame_interval = 0.0  # Running average of seconds between frames
+        self._deadline = None
+        self._work_start = None
+        self._last_frame = None
+
+    def wait(self):
+        """
+        Sleep until the next frame is due, call before reading a frame
+        """
+        if self.budget is None:
+            return
+
+        now = time.perf_counter()
+        if self._deadline is None or now - self._deadline > self.budget:
+            # First frame, or so far behind that catching up would burst
+            self._deadline = now
+        elif self._deadline > now:
+            time.sleep(self._deadline - now)
+        self._deadline += self.budget
+
+    def begin(self):
+        """
+        Mark the start of the work on a frame, call right after reading it
+        """
+        self._work_start = time.perf_counter()
+
+    def end(self):
+        """
+        Mark the end of the work on a frame, call before handing it out
+        """
+        now = time.perf_counter()
+        work = now - self._work_start
+
+        if self.frames == 0:
+            self.work_time = work
+        else:
+            self.work_time += self.SMOOTHING * (work - self.work_time)
+        if self._last_frame is not None:
+            interval = now - self._last_frame
+            if self.frame_interval == 0.0:
+                self.frame_interval = interval
+            else:
+                self.frame_interval += self.SMOOTHING * (interval - self.frame_interval)
+
+        if self.budget is not None and work > self.budget:
+            self.over_budget += 1
+        self.frames += 1
+        self._last_frame = now
+
+    def stats(self):
+        """
+        Pacing counters for monitoring
+
+        Returns:
+            Dictionary with the target rate, the achieved rate, the average
+            work per frame and the share of the frame budget it uses
+        """
+        return {
+            'target_fps': self.target_fps,
+            'fps': round(1.0 / self.frame_interval, 1) if self.frame_interval else None,
+            'frames': self.frames,
+            'work_ms': round(self.work_time * 1000, 1),
+            'budget_ms': round(self.budget * 1000, 1) if self.budget else None,
+            'budget_used': round(self.work_time / self.budget, 2) if self.budget else None,
+            'over_budget': self.over_budget
+        }
@@ -0,0 +1,264 @@
+import os
+import cv2
+import numpy as np
+import mediapipe as mp
+from utils import POSE_OPTIONS, PoseResults, landmark_array, mp_pose
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    try:
+        from tensorflow.lite import Interpreter
+    except ImportError:
+        Interpreter = None
+
+# Landmark model files shipped with the mediapipe package
+MEDIAPIPE_MODELS = {
+    0: 'pose_landmark_lite.tflite',
+    1: 'pose_landmark_full.tflite',
+    2: 'pose_landmark_heavy.tflite'
+}
+
+
+class PoseBackend:
+    """
+    Runtime running the pose model, behind one interface
+
+    infer() returns the 33 landmarks as a (33, 4) float32 array of x, y, z
+    and visibility, with x and y normalized to the image. process() wraps
+    the same result like mp_pose.Pose.process(), so a backend can be used
+    wherever a Pose graph is, including as a PosePool factory product.
+
+    Args:
+        num_threads: Threads the runtime may use for one inference (None
+            for the runtime's default)
+    """
+
+    def __init__(self, num_threads=None):
+        self.num_threads = num_threads
+
+    def infer(self, image):
+        """
+        Run pose detection on an RGB image
+
+        Args:
+            image: RGB image (uint8)
+
+        Returns:
+            (33, 4) float32 landmark array, or None when nobody was found
+        """
+        raise NotImplementedError
+
+    def process(self, image):
+        landmarks = self.infer(image)
+        return PoseResults(landmarks)
+
+    def reset(self):
+        """
+        Forget the previous stream's person before the backend is reused
+        """
+        pass
+
+    def close(self):
+        pass
+
+
+class MediaPipeBackend(PoseBackend):
+    """
+    The mediapipe solutions Pose graph, with person detection and tracking
+
+    The solutions API sizes its own thread pool, so num_threads is only
+    recorded here.
+
+    Args:
+        model_complexity: 0 (lite), 1 (full) or 2 (heavy)
+        num_threads: Not applied, see above
+    """
+
+    def __init__(self, model_complexity=1, num_threads=None):
+        super().__init__(num_threads)
+        self.pose = mp_pose.Pose(**dict(POSE_OPTIONS, model_complexity=model_complexity))
+
+    def infer(self, image):
+        results = self.pose.process(image)
+        if not results.pose_landmarks:
+            return None
+        return landmark_array(results.pose_landmarks)
+
+    def reset(self):
+        self.pose.reset()
+
+    def close(self):
+        self.pose.close()
+
+
+class LandmarkModelBackend(PoseBackend):
+    """
+    BlazePose landmark model run directly by a generic runtime
+
+    The image is letterboxed to the model's 256x256 input and the landmarks
+    are mapped back to it. There is no separate person detector, so the
+    model sees the whole image: pair it with RoiTracker so it is fed the
+    athlete's crop once they have been found.
+
+    Subclasses load the model and implement _run().
+
+    Args:
+        num_threads: Threads the runtime may use for one inference
+        presence_threshold: Lowest pose presence score accepted as a person
+    """
+    INPUT_SIZE = 256
+
+    def __init__(self, num_threads=None, presence_threshold=0.5):
+        super().__init__(num_threads)
+        self.presence_threshold = presence_threshold
+        self._canvas = np.zeros((self.INPUT_SIZE, self.INPUT_SIZE, 3), dtype=np.uint8)
+        self._tensor = np.zeros((1, self.INPUT_SIZE, self.INPUT_SIZE, 3), dtype=np.float32)
+
+    def _run(self, tensor):
+        """
+        Run the model on a 1x256x256x3 float tensor with values in [0, 1]
+
+        Returns:
+            Tuple of the flat landmark output (39 rows of x, y, z,
+            visibility, presence in input pixels) and the pose presence score
+        """
+        raise NotImplementedError
+
+    def infer(self, image):
+        height, width = image.shape[:2]
+        scale = self.INPUT_SIZE / max(height, width)
+        size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        pad_x = (self.INPUT_SIZE - size[0]) // 2
+        pad_y = (self.INPUT_SIZE - size[1]) // 2
+
+        self._canvas[:] = 0
+        self._canvas[pad_y:pad_y + size[1], pad_x:pad_x + size[0]] = cv2.resize(
+            image, size, interpolation=cv2.INTER_AREA)
+        np.multiply(self._canvas, 1.0 / 255.0, out=self._tensor[0], casting='unsafe')
+
+        raw, presence = self._run(self._tensor)
+        if presence < self.presence_threshold:
+            return None
+
+        points = np.asarray(raw, dtype=np.float32).reshape(-1, 5)[:33]
+        landmarks = np.empty((33, 4), dtype=np.float32)
+        landmarks[:, 0] = (points[:, 0] - pad_x) / size[0]
+        landmarks[:, 1] = (points[:, 1] - pad_y) / size[1]
+        landmarks[:, 2] = points[:, 2] / size[0]
+        # Visibility comes out as a logit
+        landmarks[:, 3] = 1.0 / (1.0 + np.exp(-points[:, 3]))
+        return landmarks
+
+
+def split_landmark_outputs(outputs):
+    """
+    Pick the landmark and pose presence outputs of a BlazePose landmark model
+
+    The outputs are told apart by size, since converted models name them
+    differently (Identity, ld_3d, ...).
+
+    Args:
+        outputs: Output arrays of one inference
+
+    Returns:
+        Tuple of the flat landmark array and the presence score
+    """
+    landmarks = next(output for output in outputs if output.size == 195)
+    presence = next(output for output in outputs if output.size == 1)
+    return landmarks.ravel(), float(presence.ravel()[0])
+
+
+class OnnxBackend(LandmarkModelBackend):
+    """
+    BlazePose landmark model converted to ONNX, run by ONNX Runtime
+
+    Args:
+        model_path: Path of the .onnx model
+        num_threads: ONNX Runtime intra-op threads
+        presence_threshold: Lowest pose presence score accepted as a person
+    """
+
+    def __init__(self, model_path, num_threads=None, presence_threshold=0.5):
+        if onnxruntime is None:
+            raise ImportError("ONNX Runtime is not installed, run `pip install onnxruntime`")
+        super().__init__(num_threads, presence_threshold)
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Some converters move the channels first
+        self.channels_first = model_input.shape[1] == 3
+
+    def _run(self, tensor):
+        if self.channels_first:
+            tensor = np.ascontiguousarray(tensor.transpose(0, 3, 1, 2))
+        return split_landmark_outputs(self.session.run(None, {self.input_name: tensor}))
+
+
+class TFLiteBackend(LandmarkModelBackend):
+    """
+    BlazePose landmark model run by the bare TFLite interpreter
+
+    Float models run on the XNNPACK delegate, which the interpreter applies
+    by default.
+
+    Args:
+        model_path: Path of the .tflite model (defaults to the model of the
+            given complexity shipped with mediapipe)
+        model_complexity: 0 (lite), 1 (full) or 2 (heavy), when no model
+            path is given
+        num_threads: Interpreter threads
+        presence_threshold: Lowest pose presence score accepted as a person
+    """
+
+    def __init__(self, model_path=None, model_complexity=1, num_threads=None, presence_threshold=0.5):
+        if Interpreter is None:
+            raise ImportError("No TFLite interpreter is installed, run `pip install tflite-runtime`")
+        super().__init__(num_threads, presence_threshold)
+
+        if model_path is None:
+            model_path = os.path.join(os.path.dirname(mp.__file__), 'modules', 'pose_landmark',
+                                      MEDIAPIPE_MODELS[model_complexity])
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]['index']
+        self.output_indices = [output['index'] for output in self.interpreter.get_output_details()]
+
+    def _run(self, tensor):
+        self.interpreter.set_tensor(self.input_index, tensor)
+        self.interpreter.invoke()
+        return split_landmark_outputs([self.interpreter.get_tensor(index) for index in self.output_indices])
+
+
+def create_backend(name, model_complexity=1, num_threads=None, model_path=None):
+    """
+    Create a pose backend by name
+
+    Args:
+        name: "mediapipe", "onnx" or "tflite"
+        model_complexity: Model complexity for the mediapipe and tflite models
+        num_threads: Threads per inference
+        model_path: Model file (required for onnx)
+
+    Returns:
+        PoseBackend
+    """
+    if name == 'mediapipe':
+        return MediaPipeBackend(model_complexity, num_threads)
+    if name == 'onnx':
+        if not model_path:
+            raise ValueError("The onnx backend needs a model path")
+        return OnnxBackend(model_path, num_threads)
+    if name == 'tflite':
+        return TFLiteBackend(model_path, model_complexity, num_threads)
+    raise ValueError(f"Unknown pose backend: {name}")
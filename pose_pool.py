@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+import numpy as np
+from utils import POSE_OPTIONS, mp_pose
+
+
+class PosePool:
+    """
+    Bounded pool of MediaPipe Pose graphs shared by the streams of one process
+
+    A Pose graph keeps tracking state between frames and processes one frame
+    at a time, so streams must not share one. Each stream checks a graph out
+    for its whole lifetime and gives it back when it ends. Graphs are created
+    on first use up to `size`; once all are checked out, new streams wait for
+    one to come back, and the waits are recorded for monitoring.
+
+    Graphs are kept per model_complexity. When a stream asks for a level
+    with no idle graph and the pool is full, an idle graph of another level
+    is closed to make room.
+
+    Args:
+        size: Maximum number of graphs (defaults to the number of CPU cores,
+            but at least the 8 request threads gunicorn runs with, so every
+            stream a worker can serve gets a graph)
+        timeout: Seconds a stream waits for a free graph before giving up
+        factory: Callable creating a graph for a model complexity (defaults
+            to mp_pose.Pose with the standard options)
+    """
+
+    def __init__(self, size=None, timeout=30.0, factory=None):
+        self.size = size or max(os.cpu_count() or 1, 8)
+        self.timeout = timeout
+        self._factory = factory or (lambda level: mp_pose.Pose(**dict(POSE_OPTIONS, model_complexity=level)))
+        self._idle = {}  # Model complexity -> idle graphs
+        self._levels = {}  # Graph -> its model complexity
+        self._created = 0
+        self._condition = threading.Condition()
+
+        # Metrics
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+        self.warmed = 0
+        self.warmup_time = None
+
+    def acquire(self, timeout=None, model_complexity=None):
+        """
+        Check out a graph, waiting for one to be returned if all are in use
+
+        Args:
+            timeout: Seconds to wait (defaults to the pool's timeout)
+            model_complexity: Model complexity of the graph (defaults to the
+                standard options)
+
+        Returns:
+            Pose graph reserved for the caller
+
+        Raises:
+            TimeoutError: When no graph became free in time
+        """
+        timeout = self.timeout if timeout is None else timeout
+        level = POSE_OPTIONS['model_complexity'] if model_complexity is None else model_complexity
+        start = time.perf_counter()
+        replaced = None
+
+        with self._condition:
+            available = self._condition.wait_for(
+                lambda: any(self._idle.values()) or self._created < self.size,
+                timeout=timeout
+            )
+            waited = time.perf_counter() - start
+            if not available:
+                self.timeouts += 1
+                raise TimeoutError(f"No pose graph free after {timeout:.0f}s ({self.size} in use)")
+
+            self.checkouts += 1
+            if waited > 0.001:
+                self.waits += 1
+                self.wait_time += waited
+                self.max_wait = max(self.max_wait, waited)
+
+            if self._idle.get(level):
+                return self._idle[level].pop()
+            if self._created >= self.size:
+                # Full, give up an idle graph of another level for this one
+                replaced = next(graphs for graphs in self._idle.values() if graphs).pop()
+                del self._levels[replaced]
+            else:
+                # Reserve the slot, the graph itself is built outside the lock
+                self._created += 1
+
+        if replaced is not None:
+            replaced.close()
+        try:
+            pose = self._factory(level)
+        except Exception:
+            with self._condition:
+                self._created -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._levels[pose] = level
+        return pose
+
+    def release(self, pose):
+        """
+        Return a graph to the pool
+
+        Args:
+            pose: Graph obtained from acquire()
+        """
+        # Forget the previous stream's person so the next one starts fresh
+        if hasattr(pose, 'reset'):
+            pose.reset()
+
+        with self._condition:
+            self._idle.setdefault(self._levels[pose], []).append(pose)
+            self._condition.notify()
+
+    def warm(self, count=None, frames=3, model_complexity=None):
+        """
+        Build graphs ahead of the first streams and run frames through them
+
+        Graph construction, model loading and the first inferences are slow,
+        so doing them at worker start keeps them off the first stream.
+
+        Args:
+            count: Number of graphs to warm (defaults to the pool size)
+            frames: Synthetic frames run through each graph
+            model_complexity: Model complexity of the graphs
+        """
+        count = min(self.size, count or self.size)
+        frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        start = time.perf_counter()
+
+        graphs = []
+        try:
+            for _ in range(count):
+                graphs.append(self.acquire(timeout=0, model_complexity=model_complexity))
+            for pose in graphs:
+                for _ in range(frames):
+                    pose.process(frame)
+        finally:
+            for pose in graphs:
+                self.release(pose)
+
+        with self._condition:
+            # Warm-up checkouts are not streams
+            self.checkouts -= len(graphs)
+        self.warmed = len(graphs)
+        self.warmup_time = time.perf_counter() - start
+        print(f"Warmed up {self.warmed} pose graphs in {self.warmup_time:.2f}s")
+
+    def stats(self):
+        """
+        Pool counters for monitoring
+
+        Returns:
+            Dictionary with pool size, graphs in use and wait metrics
+        """
+        with self._condition:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._created - sum(len(graphs) for graphs in self._idle.values()),
+                'idle_by_complexity': {level: len(graphs) for level, graphs in self._idle.items()},
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'avg_wait_ms': round(self.wait_time / self.waits * 1000, 1) if self.waits else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 1),
+                'timeouts': self.timeouts,
+                'warmed': self.warmed,
+                'warmup_ms': round(self.warmup_time * 1000, 1) if self.warmup_time is not None else None
+            }
+
+
+# Pool shared by every stream in this process
+pose_pool = PosePool(size=int(os.environ.get('POSE_POOL_SIZE', 0)) or None)
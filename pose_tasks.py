@@ -0,0 +1,123 @@
+import os
+import time
+import threading
+import urllib.request
+import mediapipe as mp
+from utils import POSE_OPTIONS, PoseResults
+
+# Directory holding the PoseLandmarker model bundles, fetched on first use
+MODEL_DIR = os.environ.get('POSE_MODEL_DIR', 'models')
+
+# Model bundle of each model complexity
+TASK_MODELS = {
+    0: 'pose_landmarker_lite',
+    1: 'pose_landmarker_full',
+    2: 'pose_landmarker_heavy'
+}
+TASK_MODEL_URL = 'https://storage.googleapis.com/mediapipe-models/pose_landmarker/{name}/float16/latest/{name}.task'
+
+
+def task_model_path(model_complexity=1):
+    """
+    Path of the PoseLandmarker bundle for a model complexity, downloading it
+    if it is missing
+
+    Args:
+        model_complexity: 0 (lite), 1 (full) or 2 (heavy)
+
+    Returns:
+        Path of the .task file
+    """
+    name = TASK_MODELS[model_complexity]
+    path = os.path.join(MODEL_DIR, f"{name}.task")
+    if not os.path.exists(path):
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        print(f"Downloading pose model: {path}")
+        urllib.request.urlretrieve(TASK_MODEL_URL.format(name=name), path + '.part')
+        os.replace(path + '.part', path)
+    return path
+
+
+class LiveStreamPose:
+    """
+    PoseLandmarker in LIVE_STREAM mode, used like a Pose graph
+
+    process() hands the frame to the landmarker and returns at once with
+    the most recent result that has arrived, so reading and drawing the
+    next frame overlaps with detection on this one. When detection falls
+    behind, the landmarker drops frames itself instead of queueing them.
+    The landmarks drawn on a frame may therefore come from an earlier one.
+
+    Args:
+        model_complexity: 0 (lite), 1 (full) or 2 (heavy)
+    """
+
+    def __init__(self, model_complexity=1):
+        self.model_complexity = model_complexity
+        self.latency = None  # Seconds from handing a frame over to its result
+        self.submitted = 0
+        self.completed = 0
+        self._latest = PoseResults(None)
+        self._sent = {}  # Timestamp -> time the frame was handed over
+        self._timestamp = 0
+        self._lock = threading.Lock()
+        self._landmarker = self._create()
+
+    def _create(self):
+        vision = mp.tasks.vision
+        options = vision.PoseLandmarkerOptions(
+            base_options=mp.tasks.BaseOptions(model_asset_path=task_model_path(self.model_complexity)),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            min_pose_detection_confidence=POSE_OPTIONS['min_detection_confidence'],
+            min_tracking_confidence=POSE_OPTIONS['min_tracking_confidence'],
+            result_callback=self._on_result
+        )
+        return vision.PoseLandmarker.create_from_options(options)
+
+    def _on_result(self, result, image, timestamp_ms):
+        landmarks = None
+        if result.pose_landmarks:
+            landmarks = [[point.x, point.y, point.z, point.visibility or 0.0]
+                         for point in result.pose_landmarks[0]]
+        with self._lock:
+            sent = self._sent.pop(timestamp_ms, None)
+            # Frames the landmarker dropped never get a result
+            for stale in [stamp for stamp in self._sent if stamp < timestamp_ms]:
+                del self._sent[stale]
+            if sent is not None:
+                self.latency = time.perf_counter() - sent
+            self._latest = PoseResults(landmarks)
+            self.completed += 1
+
+    def process(self, image):
+        """
+        Queue an RGB image for detection and return the latest result
+
+        Args:
+            image: RGB image (uint8), copied before this returns
+
+        Returns:
+            PoseResults of the most recent frame detection finished on
+        """
+        with self._lock:
+            # Timestamps must increase, even for frames within a millisecond
+            self._timestamp = max(self._timestamp + 1, int(time.monotonic() * 1000))
+            timestamp = self._timestamp
+            self._sent[timestamp] = time.perf_counter()
+            self.submitted += 1
+        self._landmarker.detect_async(mp.Image(image_format=mp.ImageFormat.SRGB, data=image), timestamp)
+        with self._lock:
+            return self._latest
+
+    def reset(self):
+        """
+        Forget the previous stream's person before the graph is reused
+        """
+        self._landmarker.close()
+        with self._lock:
+            self._latest = PoseResults(None)
+            self._sent.clear()
+        self._landmarker = self._create()
+
+    def close(self):
+        self._landmarker.close()
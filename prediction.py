@@ -0,0 +1,121 @@
+import numpy as np
+from utils import LandmarkList, landmark_array
+
+
+class LandmarkPredictor:
+    """
+    Runs pose detection on every Nth frame and predicts the frames between
+
+    Landmarks of the frames between two detections are extrapolated from
+    the last detected ones with a constant velocity per landmark, measured
+    between the last two detections. The stream keeps the camera's frame
+    rate while detection runs on 1 / interval of the frames. Predicted
+    landmarks carry `predicted = True` so consumers can tell them apart.
+
+    Time is taken from the frame timestamps passed to advance(), which the
+    stream calls on every frame, including frames the motion gate skips,
+    so velocities stay in landmark units per second however the frames
+    between detections were handled. A timestamp going back restarts the
+    prediction from the next detection.
+
+    Args:
+        interval: Run detection on every this many frames (1 detects every
+            frame)
+        smoothing: Weight of the newest velocity measurement, lower values
+            damp jitter between detections
+    """
+
+    def __init__(self, interval=2, smoothing=0.5):
+        self.interval = max(1, int(interval))
+        self.smoothing = smoothing
+        self.detected = 0
+        self.predicted = 0
+        self._points = None
+        self._velocity = None
+        self._since = 0  # Frames since the last detection
+        self._now = 0.0  # Timestamp of the current frame
+        self._detected_at = None  # Timestamp of the last detection
+
+    def advance(self, timestamp):
+        """
+        Move on to a new frame of the stream
+
+        A timestamp going back, as when a looped recording starts over, is
+        a jump in the stream. Nothing is extrapolated across it, the next
+        frame is detected.
+
+        Args:
+            timestamp: Seconds of the frame in the stream
+        """
+        if timestamp < self._now:
+            self._points = None
+            self._velocity = None
+            self._detected_at = None
+        self._since += 1
+        self._now = timestamp
+
+    def due(self):
+        """
+        Check if the current frame needs a detection
+
+        Returns:
+            True when detection must run, False when the frame can be predicted
+        """
+        return self._points is None or self._since >= self.interval
+
+    def observe(self, pose_landmarks):
+        """
+        Record the landmarks of a detection
+
+        Args:
+            pose_landmarks: Detected landmarks, or None when nobody was found
+
+        Returns:
+            The landmarks passed in
+        """
+        self.detected += 1
+        if pose_landmarks is None:
+            self._points = None
+            self._velocity = None
+            return None
+
+        points = landmark_array(pose_landmarks).astype(np.float64)
+        elapsed = self._now - self._detected_at if self._detected_at is not None else 0.0
+        if self._points is not None and elapsed > 0:
+            velocity = (points - self._points) / elapsed
+            velocity[:, 3] = 0.0  # Visibility is held, not extrapolated
+            if self._velocity is None:
+                self._velocity = velocity
+            else:
+                self._velocity += self.smoothing * (velocity - self._velocity)
+        self._points = points
+        self._since = 0
+        self._detected_at = self._now
+        return pose_landmarks
+
+    def predict(self):
+        """
+        Predict the landmarks of a frame between detections
+
+        Returns:
+            Predicted landmarks, flagged with `predicted = True`
+        """
+        self.predicted += 1
+        points = self._points
+        if self._velocity is not None:
+            points = points + self._velocity * (self._now - self._detected_at)
+        return LandmarkList(points, predicted=True)
+
+    def stats(self):
+        """
+        Prediction counters for monitoring
+
+        Returns:
+            Dictionary with the detection interval and the number of
+            detected and predicted frames
+        """
+        return {
+            'interval': self.interval,
+            'detected': self.detected,
+            'predicted': self.predicted
+        }
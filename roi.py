@@ -0,0 +1,168 @@
+from utils import LandmarkList, landmark_array
+
+
+class RoiTracker:
+    """
+    Crops frames to the athlete before pose detection
+
+    After a frame with landmarks, the next detection runs on the padded
+    bounding box of that body instead of the whole frame, and the landmarks
+    are mapped back to full frame coordinates. Athletes often fill a small
+    part of a gym camera's view, so far fewer pixels are converted and
+    scaled per frame. When no body is found in the crop the tracker drops
+    the box and the frame is detected again in full.
+
+    The box is only moved when the body comes close to its edge or becomes
+    much smaller than it, and its corners snap to a grid. A steady box keeps
+    the crop buffer from being reallocated and gives the Pose graph's
+    landmark smoothing a stable frame of reference.
+
+    Args:
+        padding: Margin added around the body, as a share of its larger side
+        grid: Pixel grid the box corners snap to
+        min_visibility: Landmarks below this visibility do not count towards
+            the box
+        min_points: Fewest visible landmarks needed to keep tracking
+        max_area: Share of the frame above which the full frame is used
+    """
+
+    def __init__(self, padding=0.3, grid=32, min_visibility=0.5, min_points=8, max_area=0.7):
+        self.padding = padding
+        self.grid = grid
+        self.min_visibility = min_visibility
+        self.min_points = min_points
+        self.max_area = max_area
+        self.box = None  # x0, y0, x1, y1 in pixels, None for the full frame
+
+        # Metrics
+        self.cropped = 0
+        self.full = 0
+        self.lost = 0
+        self.pixels = 0
+        self.frame_pixels = 0
+
+    def crop(self, image):
+        """
+        Select the part of a frame to run detection on
+
+        Args:
+            image: Full frame
+
+        Returns:
+            View of the frame inside the current box, or the frame itself
+        """
+        self.frame_pixels += image.shape[0] * image.shape[1]
+        if self.box is None:
+            self.full += 1
+            self.pixels += image.shape[0] * image.shape[1]
+            return image
+
+        x0, y0, x1, y1 = self.box
+        self.cropped += 1
+        self.pixels += (x1 - x0) * (y1 - y0)
+        return image[y0:y1, x0:x1]
+
+    def update(self, pose_landmarks, frame_shape):
+        """
+        Map landmarks detected on the crop to the frame and move the box
+
+        Args:
+            pose_landmarks: Landmarks detected on the output of crop(), or None
+            frame_shape: Shape of the full frame
+
+        Returns:
+            Landmarks in full frame coordinates, or None when nobody was found
+        """
+        if pose_landmarks is None:
+            if self.box is not None:
+                self.lost += 1
+            self.box = None
+            return None
+
+        points = landmark_array(pose_landmarks)
+        height, width = frame_shape[:2]
+        if self.box is not None:
+            points = points.copy()
+            x0, y0, x1, y1 = self.box
+            scale = (x1 - x0) / width
+            points[:, 0] = (x0 + points[:, 0] * (x1 - x0)) / width
+            points[:, 1] = (y0 + points[:, 1] * (y1 - y0)) / height
+            # z shares the scale of x
+            points[:, 2] *= scale
+            pose_landmarks = LandmarkList(points)
+
+        self._move_box(points, width, height)
+        return pose_landmarks
+
+    def follow(self, pose_landmarks, frame_shape):
+        """
+        Move the box to landmarks that are already in full frame coordinates,
+        e.g. ones read from a cache instead of detected on a crop
+
+        Args:
+            pose_landmarks: Landmarks in full frame coordinates, or None
+            frame_shape: Shape of the full frame
+        """
+        if pose_landmarks is None:
+            self.box = None
+            return
+        self._move_box(landmark_array(pose_landmarks), frame_shape[1], frame_shape[0])
+
+    def _move_box(self, points, width, height):
+        visible = points[points[:, 3] >= self.min_visibility]
+        if len(visible) < self.min_points:
+            self.box = None
+            return
+
+        left, top = visible[:, 0].min() * width, visible[:, 1].min() * height
+        right, bottom = visible[:, 0].max() * width, visible[:, 1].max() * height
+
+        if self.box is not None:
+            # Keep the box while the body stays inside its inner part
+            x0, y0, x1, y1 = self.box
+            margin_x = (x1 - x0) * self.padding / 4
+            margin_y = (y1 - y0) * self.padding / 4
+            inside = (left >= x0 + margin_x and right <= x1 - margin_x and
+                      top >= y0 + margin_y and bottom <= y1 - margin_y)
+            body_area = (right - left) * (bottom - top)
+            if inside and body_area > 0.25 * (x1 - x0) * (y1 - y0):
+                return
+
+        self.set_box((left, top, right, bottom), (height, width))
+
+    def set_box(self, body, frame_shape):
+        """
+        Crop the next detections to a body found some other way, e.g. by a
+        person detector
+
+        Args:
+            body: Body bounding box (left, top, right, bottom) in pixels
+            frame_shape: Shape of the full frame
+        """
+        left, top, right, bottom = body
+        height, width = frame_shape[:2]
+        pad = max(right - left, bottom - top) * self.padding
+        x0 = max(0, int((left - pad) // self.grid * self.grid))
+        y0 = max(0, int((top - pad) // self.grid * self.grid))
+        x1 = min(width, int(-(-(right + pad) // self.grid) * self.grid))
+        y1 = min(height, int(-(-(bottom + pad) // self.grid) * self.grid))
+
+        if x1 <= x0 or y1 <= y0 or (x1 - x0) * (y1 - y0) > self.max_area * width * height:
+            self.box = None
+        else:
+            self.box = (x0, y0, x1, y1)
+
+    def stats(self):
+        """
+        Cropping counters for monitoring
+
+        Returns:
+            Dictionary with cropped and full frame counts, how often the
+            body was lost from the crop and the share of pixels detected on
+        """
+        return {
+            'cropped': self.cropped,
+            'full': self.full,
+            'lost': self.lost,
+            'pixel_share': round(self.pixels / self.frame_pixels, 2) if self.frame_pixels else None
+        }
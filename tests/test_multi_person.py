@@ -0,0 +1,109 @@
+import numpy as np
+from frame_buffers import FrameArena
+from multi_person import GroupTracker
+from utils import PoseResults
+
+
+class FixedDetector:
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    def detect(self, image):
+        return list(self.boxes)
+
+
+class ScriptedPose:
+    """
+    Returns landmarks spread over the middle of the crop, with the
+    visibility of the current frame taken from a script
+    """
+
+    def __init__(self, visibilities):
+        self.visibilities = visibilities
+        self.frame = 0
+
+    def process(self, image):
+        visibility = self.visibilities[min(self.frame, len(self.visibilities) - 1)]
+        self.frame += 1
+        if visibility is None:
+            return PoseResults(None)
+        points = np.zeros((33, 4), dtype=np.float32)
+        points[:, 0] = np.linspace(0.3, 0.7, 33)
+        points[:, 1] = np.linspace(0.2, 0.8, 33)
+        points[:, 3] = visibility
+        return PoseResults(points)
+
+
+class ListPool:
+    def __init__(self, poses):
+        self.free = list(poses)
+
+    def acquire(self, timeout=None):
+        if not self.free:
+            raise TimeoutError
+        return self.free.pop(0)
+
+    def release(self, pose):
+        self.free.append(pose)
+
+
+class CountingTracker:
+    def __init__(self):
+        self.frames = 0
+
+    def update(self, landmarks):
+        self.frames += 1
+        return {'counter': self.frames}
+
+    def close(self):
+        pass
+
+
+def track(visibilities, frames):
+    poses = [ScriptedPose([1.0]), ScriptedPose(visibilities)]
+    detector = FixedDetector([(40, 40, 200, 400), (400, 40, 560, 400)])
+    group = GroupTracker(CountingTracker, ListPool(poses), max_people=2, detect_interval=100,
+                         detector=detector)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    arena = FrameArena()
+    for _ in range(frames):
+        people = group.update(image, arena)
+    return group, people
+
+
+def test_occluded_athlete_keeps_their_crop():
+    # The second athlete is partly hidden on the second frame, too few
+    # landmarks are visible to place a box around them
+    group, people = track([1.0, 0.1, 1.0], frames=3)
+
+    assert [person.id for person in people] == [1, 2]
+    for person in people:
+        x0, y0, x1, y1 = person.roi.box
+        # Never widened to the full frame
+        assert (x1 - x0) * (y1 - y0) < 640 * 480
+    assert people[1].tracker.frames == 3
+    group.close()
+
+
+def test_lost_athlete_is_dropped_after_max_missed():
+    group, people = track([1.0] + [None] * 12, frames=13)
+
+    assert [person.id for person in people] == [1]
+    group.close()
+
+
+def test_crop_buffers_are_bounded_as_athletes_come_and_go():
+    # The second athlete is never found by the Pose graph, so they are
+    # dropped and picked up again under a new id over and over
+    poses = [ScriptedPose([1.0]), ScriptedPose([None])]
+    detector = FixedDetector([(40, 40, 200, 400), (400, 40, 560, 400)])
+    group = GroupTracker(CountingTracker, ListPool(poses), max_people=2, detect_interval=1,
+                         detector=detector)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    arena = FrameArena()
+    for _ in range(60):
+        people = group.update(image, arena)
+
+    assert max(person.id for person in people) > 3
+    assert arena.stats()['buffers'] <= 2
+    group.close()
@@ -0,0 +1,26 @@
+import numpy as np
+from prediction import LandmarkPredictor
+
+
+def landmarks(x):
+    points = np.zeros((33, 4), dtype=np.float32)
+    points[:, 0] = x
+    points[:, 3] = 1.0
+    return points
+
+
+def test_looped_recording_is_not_extrapolated_across_the_wrap():
+    predictor = LandmarkPredictor(interval=3)
+    predictor.advance(298 / 30)
+    predictor.observe(landmarks(0.596))
+    predictor.advance(299 / 30)
+    predictor.observe(landmarks(0.597))
+
+    # The recording starts over, the timestamp goes back
+    predictor.advance(1 / 30)
+    assert predictor.due()
+
+    predictor.observe(landmarks(0.1))
+    predictor.advance(2 / 30)
+    assert not predictor.due()
+    assert np.allclose(predictor.predict().array[:, 0], 0.1)
@@ -0,0 +1,166 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+# Variables the BLAS and OpenMP runtimes read their thread count from when
+# they are loaded
+BLAS_ENV_VARS = (
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS'
+)
+
+
+def available_cores():
+    """
+    Number of CPU cores this process may run on
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def limit_blas_threads(count=1):
+    """
+    Limit the BLAS and OpenMP thread pools before numpy is imported
+
+    The runtimes read the limit once when they load, so this must run before
+    the first import of numpy or cv2. Limits set explicitly in the
+    environment are kept. Inference processes started later inherit it.
+
+    Args:
+        count: Threads each runtime may use
+    """
+    for name in BLAS_ENV_VARS:
+        os.environ.setdefault(name, str(count))
+
+
+class ThreadBudget:
+    """
+    Splits the CPU cores between OpenCV, pose inference and BLAS
+
+    OpenCV, the pose runtime and BLAS each start a thread pool sized to the
+    whole machine, and the web server runs a thread per stream on top. With
+    a few streams at once that is many more busy threads than cores, and the
+    streams slow each other down with context switches. The budget gives
+    each stream an equal share of the cores and sizes the pools to it.
+
+    OpenCV's thread count is process wide, it is reapplied whenever a
+    stream starts or stops. Inference threads are fixed when a graph is
+    built, and pooled graphs are built ahead of streams and reused by
+    them, so graphs are sized for the most streams expected at once
+    rather than for the streams running when they are built. The
+    mediapipe solutions graph sizes its own pool and ignores it.
+
+    Args:
+        cores: Cores to share (defaults to the cores this process may use)
+        opencv_threads: Fixed OpenCV thread count (None follows the share)
+        inference_threads: Fixed threads per inference (None follows the share)
+        blas_threads: Threads each BLAS runtime may use
+        max_sessions: Most streams expected at once, e.g. the pose pool
+            size, that inference threads are shared between (None uses
+            the streams running when a graph is built)
+    """
+
+    def __init__(self, cores=None, opencv_threads=None, inference_threads=None, blas_threads=1,
+                 max_sessions=None):
+        self.cores = cores or available_cores()
+        self.opencv_threads = opencv_threads
+        self._inference_threads = inference_threads
+        self.blas_threads = blas_threads
+        self.max_sessions = max_sessions
+        self.sessions = 0
+        self.applied = None
+        self._lock = threading.Lock()
+
+    def plan(self, sessions=None):
+        """
+        Thread counts for a number of concurrent streams
+
+        Args:
+            sessions: Streams running at once (defaults to the current count)
+
+        Returns:
+            Dictionary with opencv, inference and blas thread counts
+        """
+        if sessions is None:
+            sessions = self.sessions
+        share = max(1, self.cores // max(1, sessions))
+        return {
+            'opencv': self.opencv_threads or share,
+            'inference': self._inference_threads or share,
+            'blas': self.blas_threads
+        }
+
+    def inference_threads(self):
+        """
+        Threads a pose graph built now should use
+
+        Graphs outlive the stream they are built for, so they take the share
+        of the most streams expected at once when that is known.
+        """
+        with self._lock:
+            return self.plan(self.max_sessions)['inference']
+
+    def apply(self, sessions=None):
+        """
+        Size OpenCV's and the BLAS thread pools for a number of streams
+
+        Args:
+            sessions: Streams running at once (defaults to the current count)
+
+        Returns:
+            The applied plan, see plan()
+        """
+        # Imported here so limit_blas_threads() can run before numpy loads
+        import cv2
+
+        plan = self.plan(sessions)
+        if plan != self.applied:
+            cv2.setNumThreads(plan['opencv'])
+            if threadpool_limits is not None:
+                threadpool_limits(plan['blas'])
+            if self.applied is not None:
+                print(f"Thread budget: {plan}")
+            self.applied = plan
+        return plan
+
+    @contextmanager
+    def session(self):
+        """
+        Count a stream while it runs and resize the thread pools for it
+
+        Yields:
+            The plan applied when the stream started
+        """
+        with self._lock:
+            self.sessions += 1
+            plan = self.apply()
+        try:
+            yield plan
+        finally:
+            with self._lock:
+                self.sessions -= 1
+                self.apply(max(1, self.sessions))
+
+    def stats(self):
+        """
+        Budget state for monitoring
+
+        Returns:
+            Dictionary with the cores, running streams and applied plan
+        """
+        return {
+            'cores': self.cores,
+            'sessions': self.sessions,
+            'max_sessions': self.max_sessions,
+            'threads': self.applied,
+            'blas_runtime_limit': threadpool_limits is not None
+        }
@@ -1,7 +1,8 @@
+import cv2
 import numpy as np
-import math
 import mediapipe as mp
 import os
+from collections import namedtuple
 
 # Initialize mediapipe pose
 mp_drawing = mp.solutions.drawing_utils
@@ -9,38 +10,189 @@ mp_pose = mp.solutions.pose
 
 # Create pose instance with reasonable defaults for cloud environment
 # Note: We're using lower confidence thresholds to ensure better performance in cloud
-pose = mp_pose.Pose(
+POSE_OPTIONS = dict(
     min_detection_confidence=0.5,
     min_tracking_confidence=0.5,
     model_complexity=1  # Medium complexity for balance between performance and accuracy
 )
+pose = mp_pose.Pose(**POSE_OPTIONS)
+
+def calculate_angles(points):
+    """
+    Calculate the angles of many joints in one vectorized call
+
+    The angle comes from the arctangent of the cross and dot products, which
+    needs no clipping and stays accurate near 0 and 180 degrees. A joint
+    with two points on the same spot gets 0.
+
+    Args:
+        points: Array of shape (N, 3, 2) or (N, 3, 3), each row holding the
+            first point, the mid point and the end point of one joint
+
+    Returns:
+        Array of N angles in degrees, in the dtype of the points
+    """
+    points = np.asarray(points)
+    # Both arms of every joint in one subtraction
+    arms = points[..., ::2, :] - points[..., 1:2, :]
+    ab = arms[..., 0, :]
+    bc = arms[..., 1, :]
+
+    if points.shape[-1] == 2:
+        cross = np.abs(ab[..., 0] * bc[..., 1] - ab[..., 1] * bc[..., 0])
+    else:
+        cross = np.linalg.norm(np.cross(ab, bc), axis=-1)
+    dot = (ab * bc).sum(axis=-1)
+    return np.degrees(np.arctan2(cross, dot))
 
 def calculate_angle(a, b, c):
     """
     Calculate the angle between three points
-    
+
     Args:
         a: First point [x, y]
         b: Mid point [x, y]
         c: End point [x, y]
-        
+
     Returns:
         Angle in degrees
     """
-    a = np.array(a)  # First
-    b = np.array(b)  # Mid
-    c = np.array(c)  # End
+    return float(calculate_angles(np.array([a, b, c], dtype=np.float64)))
+
+# Landmark with the same fields as the ones returned by mediapipe
+Landmark = namedtuple('Landmark', ['x', 'y', 'z', 'visibility'])
+
+class LandmarkList:
+    """
+    Landmarks in the container mediapipe results use, with a `landmark` list
+
+    The points are kept as a float32 (33, 4) array in `array`, which
+    landmark_array() hands out without copying. The `landmark` list is only
+    built when something reads it.
+
+    Args:
+        points: Rows of x, y, z and visibility (a float32 array is kept
+            without copying and must not be changed afterwards)
+        predicted: The landmarks were predicted rather than detected
+    """
+    def __init__(self, points, predicted=False):
+        self.array = np.asarray(points, dtype=np.float32)
+        self.predicted = predicted
+        self._landmark = None
 
-    ab = a - b
-    bc = c - b
+    @property
+    def landmark(self):
+        if self._landmark is None:
+            self._landmark = [Landmark(*point) for point in self.array.tolist()]
+        return self._landmark
 
-    # Calculate the angle using dot product
-    # Use clip to handle floating point errors
-    cosine_angle = np.clip(np.dot(ab, bc) / (np.linalg.norm(ab) * np.linalg.norm(bc)), -1.0, 1.0)
-    angle = np.arccos(cosine_angle)
+class PoseResults:
+    """
+    Detection result shaped like the one returned by mp_pose.Pose.process()
     
-    # Convert to degrees
-    return math.degrees(angle)
+    Args:
+        landmarks: Rows of x, y, z and visibility of the 33 landmarks, or
+            None when nobody was detected
+    """
+    def __init__(self, landmarks):
+        self.pose_landmarks = LandmarkList(landmarks) if landmarks is not None else None
+
+def landmark_array(landmarks):
+    """
+    Pose landmarks as a float32 (33, 4) array of x, y, z and visibility
+
+    Landmarks already held in an array (a LandmarkList, or an array) are
+    returned without copying, others are converted.
+
+    Args:
+        landmarks: LandmarkList, mediapipe landmark list, sequence of
+            landmarks or array
+
+    Returns:
+        float32 array of shape (33, 4)
+    """
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.astype(np.float32, copy=False)
+    array = getattr(landmarks, 'array', None)
+    if array is not None:
+        return array
+    points = getattr(landmarks, 'landmark', landmarks)
+    return np.array([[point.x, point.y, point.z, point.visibility] for point in points], dtype=np.float32)
+
+def as_landmark_list(pose_landmarks):
+    """
+    Convert detected landmarks to a LandmarkList once, so everything reading
+    them later in the frame shares one array
+
+    Args:
+        pose_landmarks: Landmarks returned by a Pose graph, or None
+
+    Returns:
+        LandmarkList, or None when nobody was detected
+    """
+    if pose_landmarks is None or isinstance(pose_landmarks, LandmarkList):
+        return pose_landmarks
+    return LandmarkList(landmark_array(pose_landmarks))
+
+def to_pixels(points, size):
+    """
+    Pixel coordinates of normalized landmark points
+
+    Args:
+        points: Array whose last axis starts with normalized x and y
+        size: (width, height) of the image
+
+    Returns:
+        Nested lists of integer [x, y] pairs, shaped like the points
+    """
+    return (points[..., :2] * np.array(size, dtype=np.float64)).astype(int).tolist()
+
+def landmarks_from_payload(data):
+    """
+    Build pose landmarks from landmarks uploaded by a client
+    
+    Args:
+        data: List of 33 landmarks, each either [x, y, z, visibility] or a
+            dictionary with those keys (z and visibility are optional)
+        
+    Returns:
+        float32 (33, 4) array of x, y, z and visibility, indexed like
+        mediapipe pose landmarks
+    """
+    if not isinstance(data, (list, tuple)) or len(data) != len(mp_pose.PoseLandmark):
+        raise ValueError(f"Expected {len(mp_pose.PoseLandmark)} landmarks")
+
+    landmarks = []
+    for point in data:
+        if isinstance(point, dict):
+            point = [point.get('x'), point.get('y'), point.get('z', 0.0), point.get('visibility', 1.0)]
+        elif len(point) == 2:
+            point = list(point) + [0.0, 1.0]
+        elif len(point) == 3:
+            point = list(point) + [1.0]
+        elif len(point) != 4:
+            raise ValueError("Expected 2 to 4 values per landmark")
+        landmarks.append([float(value) for value in point])
+    return np.array(landmarks, dtype=np.float32)
+
+def shade_rectangle(image, pt1, pt2, alpha=0.5):
+    """
+    Darken a rectangle of the image in place, as a background for text
+    
+    Gives the same result as blending a filled black rectangle over the image
+    with cv2.addWeighted, without copying the whole frame.
+    
+    Args:
+        image: BGR image to draw on
+        pt1: Top left corner (x, y)
+        pt2: Bottom right corner (x, y)
+        alpha: Opacity of the black background
+    """
+    x1, y1 = max(pt1[0], 0), max(pt1[1], 0)
+    x2, y2 = min(pt2[0] + 1, image.shape[1]), min(pt2[1] + 1, image.shape[0])
+    if x1 < x2 and y1 < y2:
+        region = image[y1:y2, x1:x2]
+        cv2.convertScaleAbs(region, dst=region, alpha=1.0 - alpha)
 
 def ensure_directories():
     """